@@ -99,14 +99,16 @@ which determines the access privileges. The possible roles are:
         rows = [TR(TH('Workset'),
                    TH('# samples'),
                    TH('Timestamp'))]
-        view = self.db.view('workset/operator', include_docs=True)
-        for result in view[self.doc['name']]:
-            doc = result.doc
-            url = configuration.get_url('workset', doc['name'])
-            workset = A(doc['name'], href=url)
+        view = self.db.view('workset/operator_name',
+                            startkey=[self.doc['name']],
+                            endkey=[self.doc['name'], {}])
+        for result in view:
+            name = result.key[1]
+            url = configuration.get_url('workset', name)
+            workset = A(name, href=url)
             rows.append(TR(TD(workset),
-                           TD(str(len(doc.get('samples', [])))),
-                           TD(doc['timestamp'])))
+                           TD(str(result.value['count'])),
+                           TD(result.value['timestamp'] or '')))
         page.append(P(TABLE(border=1, *rows)))
 
     def view_projects(self, page):
@@ -114,16 +116,18 @@ which determines the access privileges. The possible roles are:
         rows = [TR(TH('Project'),
                    TH('Label'),
                    TH('Timestamp'))]
-        view = self.db.view('project/customer', include_docs=True)
-        docs = [r.doc for r in view[self.doc['name']]]
-        docs.sort(lambda i, j: cmp(i['name'], j['name']))
-        for doc in docs:
-            url = configuration.get_entity_url(doc)
-            rows.append(TR(TD(A(doc['name'], href=url)),
-                           TD(doc.get('label') or ''),
-                           TD(doc.get('timestamp') or '')))
+        view = self.db.view('project/customer_name',
+                            startkey=[self.doc['name']],
+                            endkey=[self.doc['name'], {}])
+        for result in view:
+            summary = result.value
+            url = configuration.get_url('project', summary['name'])
+            rows.append(TR(TD(A(summary['name'], href=url)),
+                           TD(summary['label'] or ''),
+                           TD(summary['timestamp'] or '')))
         page.append(P(TABLE(border=1, *rows)))
 
+    @cached_view
     def view_image(self, page):
         stubs = self.doc.get('_attachments', dict())
         for ext in ('.jpg', '.png'):
@@ -175,14 +179,19 @@ class Accounts(Dispatcher):
                    TH('Full name'),
                    TH('Role'),
                    TH('Initials'))]
-        for result in self.db.view('account/name', include_docs=True):
-            doc = result.doc
+        results, navigation = self.get_page(request,
+                                            'account/list',
+                                            'accounts')
+        for result in results:
+            summary = result.value
             ref = A(result.key,
                     href=configuration.get_url('account', result.key))
             rows.append(TR(TD(ref),
-                           TD(result.value or ''),
-                           TD(doc.get('role')),
-                           TD(doc.get('initials') or '')))
+                           TD(summary['fullname'] or ''),
+                           TD(summary['role'] or ''),
+                           TD(summary['initials'] or '')))
         page.append(TABLE(border=1, *rows))
+        if navigation:
+            page.append(navigation)
 
         page.write(response)
@@ -0,0 +1,79 @@
+""" slog: Simple sample tracker system.
+
+In-process cache with optional size bound and time-to-live.
+
+Per Kraulis
+2011-04-04
+"""
+
+import time, threading
+
+from collections import OrderedDict
+
+
+class Cache(object):
+    """Thread-safe in-process cache. If 'size' is given, then the least
+    recently used item is evicted when the size is exceeded. If 'ttl' is
+    given, then an item expires that many seconds after it was set."""
+
+    def __init__(self, size=None, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.items = OrderedDict()      # key: (value, expiry)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, default=None):
+        "Return the value for the key, or the default if none or expired."
+        with self.lock:
+            try:
+                value, expiry = self.items.pop(key)
+                if expiry is not None and expiry < time.time():
+                    raise KeyError
+            except KeyError:
+                self.misses += 1
+                return default
+            self.items[key] = (value, expiry) # Now most recently used
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        "Set the value for the key, evicting the oldest item if required."
+        if self.ttl is None:
+            expiry = None
+        else:
+            expiry = time.time() + self.ttl
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (value, expiry)
+            if self.size is not None:
+                while len(self.items) > self.size:
+                    self.items.popitem(last=False)
+
+    def delete(self, key):
+        "Remove the item for the key, if any."
+        with self.lock:
+            self.items.pop(key, None)
+
+    def discard(self, predicate):
+        "Remove all items whose value satisfies the predicate."
+        with self.lock:
+            for key, (value, expiry) in self.items.items():
+                if predicate(value):
+                    del self.items[key]
+
+    def clear(self):
+        "Remove all items."
+        with self.lock:
+            self.items.clear()
+
+    def get_stats(self):
+        "Return a dictionary of the cache counters."
+        with self.lock:
+            return dict(items=len(self.items),
+                        hits=self.hits,
+                        misses=self.misses)
@@ -7,7 +7,7 @@ Per Kraulis
 2011-03-29  split out site-specific config info
 """
 
-import socket, sys, re, os.path
+import socket, sys, re, os.path, threading
 
 import couchdb
 
@@ -34,12 +34,92 @@ except ImportError:
 site = sys.modules[MODULENAME]
 
 
-def get_db():
-    "Get the database instance, possibly with credentials loaded."
+def open_db():
+    """Open a new database instance, possibly with credentials loaded.
+    If the design documents are merged, then map the view names."""
     db = couchdb.Server(site.COUCHDB_SERVER)[site.COUCHDB_DATABASE]
     if site.COUCHDB_USER and site.COUCHDB_PASSWORD:
         db.resource.http.add_credentials(site.COUCHDB_USER,
                                          site.COUCHDB_PASSWORD)
+    groups = getattr(site, 'DESIGN_GROUPS', None)
+    if groups:
+        from .design import MappedDatabase
+        db = MappedDatabase(db, groups)
+    return db
+
+
+class DatabasePool(object):
+    """Worker-wide pool of database instances. Each thread is handed
+    its own instance, which keeps its HTTP connection alive between
+    requests. At most 'size' instances are retained; when that many
+    are held, those of threads that have exited are dropped first, so
+    that new threads get pooled instances. Threads beyond that get a
+    fresh instance each time."""
+
+    def __init__(self, size, open=open_db):
+        self.size = size
+        self.open = open                # Function creating an instance
+        self.fixed = None               # Instance to use for all threads
+        self.lock = threading.Lock()
+        self.instances = dict()         # Key: thread ident
+        self.opened = 0
+        self.reused = 0
+
+    def get(self):
+        "Return the database instance for the current thread."
+        if self.fixed is not None:
+            return self.fixed
+        ident = threading.current_thread().ident
+        with self.lock:
+            try:
+                db = self.instances[ident]
+            except KeyError:
+                pass
+            else:
+                self.reused += 1
+                return db
+        db = self.open()
+        with self.lock:
+            self.opened += 1
+            if len(self.instances) >= self.size:
+                self.prune()
+            if len(self.instances) < self.size:
+                self.instances[ident] = db
+        return db
+
+    def prune(self):
+        """Drop the instances of the threads that have exited.
+        The lock must be held."""
+        live = set([t.ident for t in threading.enumerate()])
+        for ident in self.instances.keys():
+            if ident not in live:
+                del self.instances[ident]
+
+    def get_stats(self):
+        "Return a dictionary of the connection counters."
+        with self.lock:
+            return dict(size=self.size,
+                        retained=len(self.instances),
+                        opened=self.opened,
+                        reused=self.reused)
+
+
+POOL = DatabasePool(getattr(site, 'COUCHDB_POOL_SIZE', 10))
+
+
+def set_db(db):
+    """Use the given database instance for all threads, instead of
+    connecting to the CouchDB server. For tests and benchmarks."""
+    POOL.fixed = db
+
+def get_db():
+    """Get the pooled database instance for the current thread.
+    If instrumentation is enabled for the site, then it is wrapped
+    in a new instance recording the calls made through it."""
+    db = POOL.get()
+    if getattr(site, 'DATABASE_INSTRUMENTATION', False):
+        from .dbstats import InstrumentedDatabase
+        db = InstrumentedDatabase(db)
     return db
 
 def get_url(entity, name=None, attachment=None):
@@ -0,0 +1,181 @@
+""" slog: Simple sample tracker system.
+
+Instrumentation of database calls, to show how many CouchDB round trips
+a page costs, and which ones.
+
+Per Kraulis
+2011-04-05
+"""
+
+import time, json, logging, cStringIO
+
+
+def get_size(value):
+    "Return the approximate size in bytes of the value in JSON."
+    try:
+        return len(json.dumps(value))
+    except (TypeError, ValueError):
+        return 0
+
+def get_key_shape(options):
+    "Return a description of the key options for a view query."
+    if 'keys' in options:
+        return "keys[%i]" % len(options['keys'])
+    elif 'key' in options:
+        return 'key'
+    elif 'startkey' in options or 'endkey' in options:
+        return 'range'
+    else:
+        return 'all'
+
+
+class InstrumentedDatabase(object):
+    """Wrapper for a database instance, recording each call
+    that goes to the CouchDB server."""
+
+    def __init__(self, db):
+        self.db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        "Other attributes are passed on to the wrapped instance."
+        return getattr(self.db, name)
+
+    def record(self, method, name, shape, rows, size, started):
+        "Record a call to the server."
+        self.calls.append(dict(method=method,
+                               name=name,
+                               shape=shape,
+                               rows=rows,
+                               bytes=size,
+                               time=time.time() - started))
+
+    def view(self, name, **options):
+        "The view query is recorded when its rows are fetched."
+        return InstrumentedView(self,
+                                name,
+                                self.db.view(name, **options),
+                                get_key_shape(options))
+
+    def __getitem__(self, id):
+        started = time.time()
+        doc = None
+        try:
+            doc = self.db[id]
+            return doc
+        finally:
+            self.record('get', id, 'id',
+                        doc is not None and 1 or 0, get_size(doc), started)
+
+    def save(self, doc, **options):
+        started = time.time()
+        try:
+            return self.db.save(doc, **options)
+        finally:
+            self.record('save', doc.get('_id'), 'doc', 1, get_size(doc),
+                        started)
+
+    def get_attachment(self, id_or_doc, filename, *args, **kwargs):
+        started = time.time()
+        infile = self.db.get_attachment(id_or_doc, filename, *args, **kwargs)
+        if hasattr(infile, 'read'):
+            content = infile.read()
+            infile = cStringIO.StringIO(content)
+            size = len(content)
+        else:
+            size = 0
+        self.record('get_attachment', filename, 'attachment',
+                    infile is not None and 1 or 0, size, started)
+        return infile
+
+    def put_attachment(self, doc, content, *args, **kwargs):
+        started = time.time()
+        try:
+            return self.db.put_attachment(doc, content, *args, **kwargs)
+        finally:
+            if isinstance(content, basestring):
+                size = len(content)
+            else:
+                size = 0
+            self.record('put_attachment', doc.get('_id'), 'attachment',
+                        1, size, started)
+
+    def delete_attachment(self, doc, filename):
+        started = time.time()
+        try:
+            return self.db.delete_attachment(doc, filename)
+        finally:
+            self.record('delete_attachment', filename, 'attachment',
+                        1, 0, started)
+
+    def get_summary(self):
+        "Return a dictionary summarizing the calls made so far."
+        names = dict()
+        for call in self.calls:
+            key = "%s %s" % (call['method'], call['name'])
+            names[key] = names.get(key, 0) + 1
+        return dict(calls=len(self.calls),
+                    rows=sum([c['rows'] for c in self.calls]),
+                    bytes=sum([c['bytes'] for c in self.calls]),
+                    time=sum([c['time'] for c in self.calls]),
+                    names=names)
+
+    def get_summary_line(self):
+        "Return a one-line description of the calls made so far."
+        summary = self.get_summary()
+        return "%i db calls, %i rows, %i bytes, %.1f ms" % \
+               (summary['calls'],
+                summary['rows'],
+                summary['bytes'],
+                1000.0 * summary['time'])
+
+    def get_json(self, indent=None):
+        "Return the summary and all calls as a JSON string."
+        return json.dumps(dict(summary=self.get_summary(),
+                               calls=self.calls),
+                          indent=indent)
+
+    def log(self, label):
+        "Log the summary; if any repeated call, then log it too."
+        logging.info("%s: %s", label, self.get_summary_line())
+        for key, count in sorted(self.get_summary()['names'].items()):
+            if count > 1:
+                logging.info("%s: %i x %s", label, count, key)
+
+
+class InstrumentedView(object):
+    "Wrapper for view results, recording the query when rows are fetched."
+
+    def __init__(self, db, name, results, shape):
+        self.db = db
+        self.name = name
+        self.results = results
+        self.shape = shape
+        self._rows = None
+
+    def __getattr__(self, name):
+        "Other attributes (such as 'total_rows') require fetched rows."
+        self.rows
+        return getattr(self.results, name)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            shape = 'range'
+        else:
+            shape = 'key'
+        return InstrumentedView(self.db, self.name, self.results[key], shape)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            started = time.time()
+            self._rows = self.results.rows
+            self.db.record('view', self.name, self.shape,
+                           len(self._rows), get_size(self._rows), started)
+        return self._rows
@@ -0,0 +1,58 @@
+""" slog: Simple sample tracker system.
+
+Mapping of the view names '<entity>/<view>' used in the code to the
+design documents actually in the database.
+
+By default, each directory under 'designs/' is a design document of its
+own. Since CouchDB updates the index of each design document in a pass
+of its own over the changed documents, the views may instead be merged
+into a few design documents by setting DESIGN_GROUPS in the site module
+to a dictionary {design name: list of directories}. In a merged design
+document, the view 'sample/name' is called 'sample_name'.
+
+Per Kraulis
+2011-04-09
+"""
+
+from . import configuration
+
+
+def get_groups():
+    "Return the dictionary of design groups, or None if not merged."
+    return getattr(configuration.site, 'DESIGN_GROUPS', None)
+
+def get_group(directory, groups):
+    "Return the name of the design group containing the given directory."
+    for group, directories in groups.iteritems():
+        if directory in directories:
+            return group
+    raise KeyError("design directory '%s' not in any group" % directory)
+
+def get_view_name(name, groups=None):
+    "Return the name of the view in the database."
+    if groups is None:
+        groups = get_groups()
+        if groups is None:
+            return name
+    directory, view = name.split('/', 1)
+    return "%s/%s_%s" % (get_group(directory, groups), directory, view)
+
+
+class MappedDatabase(object):
+    "Wrapper for a database instance, mapping the view names."
+
+    def __init__(self, db, groups):
+        self.db = db
+        self.groups = groups
+
+    def __getattr__(self, name):
+        "Other attributes are passed on to the wrapped instance."
+        return getattr(self.db, name)
+
+    def __getitem__(self, id):
+        return self.db[id]
+
+    def view(self, name, **options):
+        if not name.startswith('_'):    # Builtin views such as '_all_docs'
+            name = get_view_name(name, self.groups)
+        return self.db.view(name, **options)
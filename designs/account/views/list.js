@@ -0,0 +1,8 @@
+/* Index 'account' documents by name, for the Accounts list.
+   Value: the columns shown in the list. */
+function(doc) {
+    if (doc.entity !== 'account') return;
+    emit(doc.name, {fullname: doc.fullname || null,
+                    role: doc.role || null,
+                    initials: doc.initials || null});
+}
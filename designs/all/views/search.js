@@ -0,0 +1,22 @@
+/* Index the searchable attributes of the entity documents: name, tags,
+   operator, customername and runname.
+   Key: the value in lower case. Value: [entity, name, attribute]. */
+function(doc) {
+    var entities = ['account', 'project', 'sample', 'workset',
+                    'protocol', 'task', 'instrument'];
+    var attributes = ['name', 'operator', 'customername', 'runname'];
+    var i;
+    function index(value, attribute) {
+        if (typeof value !== 'string' || !value) return;
+        emit(value.toLowerCase(), [doc.entity, doc.name, attribute]);
+    }
+    if (entities.indexOf(doc.entity) < 0) return;
+    if (!doc.name) return;
+    for (i=0; i<attributes.length; i+=1) {
+        index(doc[attributes[i]], attributes[i]);
+    }
+    if (!doc.tags) return;
+    for (i=0; i<doc.tags.length; i+=1) {
+        index(doc.tags[i], 'tag');
+    }
+}
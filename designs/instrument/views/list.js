@@ -0,0 +1,8 @@
+/* Index 'instrument' documents by name, for the Instruments list.
+   Value: the columns shown in the list. */
+function(doc) {
+    if (doc.entity !== 'instrument') return;
+    emit(doc.name, {label: doc.label || null,
+                    type: doc.type || null,
+                    timestamp: doc.timestamp || null});
+}
@@ -0,0 +1,10 @@
+/* Index the delta-encoded log documents by logged document id and
+   sequence number.
+   Value: checkpoint flag and resulting revision. */
+function(doc) {
+  if (doc.entity !== 'log') return;
+  if (!doc.docid) return;
+  if (!doc.sequence) return;
+  emit([doc.docid, doc.sequence], {checkpoint: doc.checkpoint ? true : false,
+                                   rev: doc.rev || null});
+}
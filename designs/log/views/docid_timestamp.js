@@ -1,8 +1,14 @@
 /* Index all log documents by logged document id and timestamp.
-   Value: The action. */
+   Value: The columns displayed in the log list, and the sequence number,
+   checkpoint flag and resulting revision used by the delta encoding. */
 function(doc) {
   if (doc.entity !== 'log') return;
   if (!doc.docid) return;
   if (!doc.timestamp) return;
-  emit([doc.docid, doc.timestamp], doc.action);
-}
\ No newline at end of file
+  emit([doc.docid, doc.timestamp], {action: doc.action,
+                                    account: doc.account || null,
+                                    comment: doc.comment || null,
+                                    sequence: doc.sequence || null,
+                                    checkpoint: doc.checkpoint ? true : false,
+                                    rev: doc.rev || null});
+}
@@ -0,0 +1,9 @@
+/* Index 'project' documents by customer and name, for lists sorted
+   by name. Value: the columns shown in the Projects list. */
+function(doc) {
+    if (doc.entity !== 'project') return;
+    emit([doc.customer, doc.name], {name: doc.name,
+                                    label: doc.label || null,
+                                    customer: doc.customer || null,
+                                    timestamp: doc.timestamp || null});
+}
@@ -0,0 +1,9 @@
+/* Index 'project' documents by timestamp, for the Projects list.
+   Value: the columns shown in the list. */
+function(doc) {
+    if (doc.entity !== 'project') return;
+    emit(doc.timestamp, {name: doc.name,
+                         label: doc.label || null,
+                         customer: doc.customer || null,
+                         timestamp: doc.timestamp || null});
+}
@@ -0,0 +1,6 @@
+/* Count the number of 'project' documents per customer; map function */
+function(doc) {
+    if (doc.entity !== 'project') return;
+    if (!doc.customer) return;
+    emit(doc.customer, 1);
+}
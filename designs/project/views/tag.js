@@ -1,10 +0,0 @@
-/* Index 'project' documents by tag.
-   Value: name. */
-function(doc) {
-    if (doc.entity !== 'project') return;
-    if (!doc.tags) return;
-    var i;
-    for (i=0; i<doc.tags.length; i+=1) {
-	emit(doc.tags[i], doc.name);
-    }
-}
\ No newline at end of file
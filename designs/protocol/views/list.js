@@ -0,0 +1,6 @@
+/* Index 'protocol' documents by name, for the Protocols list.
+   Value: the columns shown in the list. */
+function(doc) {
+    if (doc.entity !== 'protocol') return;
+    emit(doc.name, {timestamp: doc.timestamp || null});
+}
@@ -0,0 +1,7 @@
+/* Index all sample documents by the project, for the Samples list.
+   Value: [name, customername]. */
+function(doc) {
+    if (doc.entity !== 'sample') return;
+    if (!doc.project) return;
+    emit(doc.project, [doc.name, doc.customername || null]);
+}
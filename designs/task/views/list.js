@@ -0,0 +1,10 @@
+/* Index 'task' documents by name, for the Tasks list.
+   Value: the columns shown in the list. */
+function(doc) {
+    if (doc.entity !== 'task') return;
+    emit(doc.name, {runname: doc.runname || null,
+                    protocol: doc.protocol || null,
+                    instrument: doc.instrument || null,
+                    operator: doc.operator || null,
+                    timestamp: doc.timestamp || null});
+}
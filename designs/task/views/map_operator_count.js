@@ -0,0 +1,6 @@
+/* Count the number of 'task' documents per operator; map function */
+function(doc) {
+    if (doc.entity !== 'task') return;
+    if (!doc.operator) return;
+    emit(doc.operator, 1);
+}
@@ -1,6 +0,0 @@
-/* Index 'task' documents by operator.
-   Value: name. */
-function(doc) {
-    if (doc.entity !== 'task') return;
-    emit(doc.operator, doc.name);
-}
\ No newline at end of file
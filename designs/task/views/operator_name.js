@@ -0,0 +1,10 @@
+/* Index 'task' documents by operator and name, for lists sorted by name.
+   Value: the columns shown in the Tasks list. */
+function(doc) {
+    if (doc.entity !== 'task') return;
+    emit([doc.operator, doc.name], {runname: doc.runname || null,
+                                    protocol: doc.protocol || null,
+                                    instrument: doc.instrument || null,
+                                    operator: doc.operator || null,
+                                    timestamp: doc.timestamp || null});
+}
@@ -0,0 +1,8 @@
+/* Index 'workset' documents by name, for the Worksets list.
+   Value: the columns shown in the list. */
+function(doc) {
+    if (doc.entity !== 'workset') return;
+    emit(doc.name, {operator: doc.operator || null,
+                    count: doc.samples ? doc.samples.length : 0,
+                    timestamp: doc.timestamp || null});
+}
@@ -0,0 +1,6 @@
+/* Count the number of 'workset' documents per operator; map function */
+function(doc) {
+    if (doc.entity !== 'workset') return;
+    if (!doc.operator) return;
+    emit(doc.operator, 1);
+}
@@ -1,6 +0,0 @@
-/* Index 'workset' documents by operator.
-   Value: name. */
-function(doc) {
-    if (doc.entity !== 'workset') return;
-    emit(doc.operator, doc.name);
-}
\ No newline at end of file
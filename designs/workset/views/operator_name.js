@@ -0,0 +1,8 @@
+/* Index 'workset' documents by operator and name, for lists sorted
+   by name. Value: the columns shown in the Worksets list. */
+function(doc) {
+    if (doc.entity !== 'workset') return;
+    emit([doc.operator, doc.name], {operator: doc.operator || null,
+                                    count: doc.samples ? doc.samples.length : 0,
+                                    timestamp: doc.timestamp || null});
+}
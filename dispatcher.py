@@ -6,7 +6,7 @@ Per Kraulis
 2011-02-02
 """
 
-import json, mimetypes, logging
+import json, mimetypes, logging, hashlib, urllib
 
 import couchdb
 
@@ -14,14 +14,69 @@ from wireframe.dispatcher import BaseDispatcher
 from wireframe.response import *
 from wireframe import basic_authenticate
 
-from . import configuration, utils
+from . import configuration, utils, history
+from .cache import Cache
+from .replica import REPLICA, get_discard_listener, get_clear_listener
+from .names import NAMES, ENTITIES as NAMES_ENTITIES
 from .html_page import *
 
 
+# Authenticated account documents, keyed by digest of Authorization header.
+# Changed accounts are dropped as the replica follows the changes feed.
+AUTHENTICATION_CACHE = Cache(
+    size=getattr(configuration.site, 'AUTHENTICATION_CACHE_SIZE', 1000),
+    ttl=getattr(configuration.site, 'AUTHENTICATION_CACHE_TTL', 300))
+REPLICA.add_listener(get_discard_listener(AUTHENTICATION_CACHE, ['account']))
+
+# Key: list, value: view counting the listed entities per account.
+OPERATOR_VIEWS = dict(samples='project/customer_count',
+                      tasks='task/operator_count',
+                      worksets='workset/operator_count')
+
+# Saving any of these invalidates the operator selection forms.
+OPERATOR_ENTITIES = ('account', 'project', 'task', 'workset')
+
+# Serialized operator selection forms, keyed by (list, selected operator).
+# Cleared as the replica follows changes to the entities above.
+OPERATOR_FORM_CACHE = Cache(
+    size=getattr(configuration.site, 'OPERATOR_FORM_CACHE_SIZE', 300),
+    ttl=getattr(configuration.site, 'OPERATOR_FORM_CACHE_TTL', 60))
+REPLICA.add_listener(get_clear_listener(OPERATOR_FORM_CACHE,
+                                        OPERATOR_ENTITIES))
+
+# Max number of keys in one multi-key view query.
+NAMES_CHUNK_SIZE = 500
+
+# Max number of names returned by the type-ahead lookup.
+NAMES_LOOKUP_LIMIT = 20
+
+# Appended to a prefix to get the end key of a range view query.
+NAMES_KEY_END = u'\ufff0'
+
+
 class Dispatcher(BaseDispatcher):
 
     def prepare(self, request, response):
         self.db = configuration.get_db()
+        # Identity map of the documents fetched during this request
+        self.documents = dict()         # Key: docid
+        self.named_documents = dict()   # Key: (entity, name)
+        REPLICA.sync(self.db)
+        self.authenticate(request)
+        self.user_agent = request.environ.get('HTTP_USER_AGENT')
+        self.environ = request.environ
+
+    def authenticate(self, request):
+        """Set the account document for the user given by the Basic
+        authentication. A successful login is cached for a limited
+        time, so that repeat requests do not query the database."""
+        authorization = request.environ.get('HTTP_AUTHORIZATION')
+        if authorization:
+            key = hashlib.sha1(authorization).hexdigest()
+            user = AUTHENTICATION_CACHE.get(key)
+            if user is not None:
+                self.user = couchdb.Document(user)
+                return
         try:
             user, password = basic_authenticate.decode(request)
             self.user = self.get_named_document('account', user)
@@ -29,16 +84,101 @@ class Dispatcher(BaseDispatcher):
                 raise ValueError
         except ValueError:
             raise HTTP_UNAUTHORIZED_BASIC_CHALLENGE(realm='slog')
-        self.user_agent = request.environ.get('HTTP_USER_AGENT')
+        if authorization:
+            AUTHENTICATION_CACHE.set(key, couchdb.Document(self.user))
 
     def get_named_document(self, entity, name):
         """Get the document for the given entity and name.
+        It is fetched from the database at most once per request.
         Raise ValueError if not found."""
-        view = self.db.view("%s/name" % entity, include_docs=True)
-        result = view[name]
-        if len(result) != 1:
-            raise ValueError("no such %s document '%s'" % (entity, name))
-        return result.rows[0].doc
+        try:
+            return self.named_documents[(entity, name)]
+        except KeyError:
+            pass
+        if REPLICA.is_current(entity):
+            doc = REPLICA.get(entity, name)
+            if doc is None:
+                raise ValueError("no such %s document '%s'" % (entity, name))
+        else:
+            view = self.db.view("%s/name" % entity, include_docs=True)
+            result = view[name]
+            if len(result) != 1:
+                raise ValueError("no such %s document '%s'" % (entity, name))
+            doc = result.rows[0].doc
+        self.set_document(doc)
+        return doc
+
+    def get_named_documents(self, entity, names):
+        """Get the documents for the given entity and names. Those not
+        already fetched during this request are fetched using multi-key
+        view queries, at most 'NAMES_CHUNK_SIZE' names per query.
+        Return a tuple (dictionary name->document, list of missing names)."""
+        result = dict()
+        wanted = []
+        for name in names:
+            if name in result: continue
+            try:
+                result[name] = self.named_documents[(entity, name)]
+            except KeyError:
+                if name not in wanted:
+                    wanted.append(name)
+        requested = list(wanted)
+        if REPLICA.is_current(entity):
+            for name in wanted:
+                doc = REPLICA.get(entity, name)
+                if doc is None: continue
+                result[name] = doc
+                self.set_document(doc)
+            wanted = []
+        for pos in xrange(0, len(wanted), NAMES_CHUNK_SIZE):
+            view = self.db.view("%s/name" % entity,
+                                keys=wanted[pos:pos+NAMES_CHUNK_SIZE],
+                                include_docs=True)
+            for row in view:
+                if row.key in result: continue
+                doc = row.doc           # A new instance for each access
+                result[row.key] = doc
+                self.set_document(doc)
+        missing = [n for n in requested if n not in result]
+        return result, missing
+
+    def get_names(self, entity):
+        "Return the sorted list of names of all documents of the entity."
+        if NAMES.is_current():
+            return NAMES.get_names(self.db, entity)
+        elif REPLICA.is_current(entity):
+            return REPLICA.get_names(entity)
+        else:
+            return [r.key for r in self.db.view("%s/name" % entity)]
+
+    def get_names_count(self, entity):
+        "Return the number of documents of the entity."
+        if NAMES.is_current():
+            return NAMES.get_count(self.db, entity)
+        else:
+            return len(self.get_names(entity))
+
+    def get_document_by_id(self, id, reload=False):
+        """Get the document for the given id. It is fetched from the
+        database at most once per request, unless 'reload' is True.
+        Raise couchdb.ResourceNotFound if not found."""
+        if not reload:
+            try:
+                return self.documents[id]
+            except KeyError:
+                pass
+        doc = self.db[id]
+        self.set_document(doc)
+        REPLICA.apply(doc)
+        return doc
+
+    def set_document(self, doc):
+        "Put the document into the identity map of this request."
+        self.documents[doc['_id']] = doc
+        try:
+            self.named_documents[(doc['entity'], doc['name'])] = doc
+        except KeyError:
+            pass
 
     def get_viewable(self, user):
         """Is the given user allowed to view this page?
@@ -88,33 +228,186 @@ class Dispatcher(BaseDispatcher):
         return operator
 
     def get_operator_select_form(self, entities, operator=None):
-        "Return the HTML form for selecting the operator to show entities of."
+        """Return the serialized HTML form for selecting the operator to
+        show entities of. Only the accounts owning any of the entities
+        are given, as obtained from the reduce view for the list. The form
+        is cached per worker, and is discarded when an account or an owned
+        entity is saved, in this worker or, via the replica, in another."""
+        key = (entities, operator)
+        form = OPERATOR_FORM_CACHE.get(key)
+        if form is not None: return form
+        view = self.db.view(OPERATOR_VIEWS[entities], group=True)
+        names = [r.key for r in view if r.key]
+        if operator and operator not in names:
+            names.append(operator)
+            names.sort(key=utils.collation_key)
         options = [OPTION('all')]
-        for result in self.db.view('account/name'):
-            if operator == result.key:
-                options.append(OPTION(result.key, selected=True))
+        for name in names:
+            if operator == name:
+                options.append(OPTION(name, selected=True))
+            else:
+                options.append(OPTION(name))
+        form = str(FORM(SELECT(name='operator', *options),
+                        INPUT(type='submit', value='Select operator'),
+                        method='GET',
+                        action=configuration.get_url(entities)))
+        OPERATOR_FORM_CACHE.set(key, form)
+        return form
+
+    def get_page_size(self, request, default=None):
+        "Get the number of rows per page of a list, within limits."
+        if default is None:
+            default = getattr(configuration.site, 'LIST_PAGE_SIZE', 100)
+        maximum = getattr(configuration.site, 'LIST_PAGE_SIZE_MAX', 1000)
+        try:
+            size = int(request.get('page_size') or default)
+            if size <= 0: raise ValueError
+        except ValueError:
+            raise HTTP_BAD_REQUEST('invalid page size')
+        return min(size, maximum)
+
+    def get_page(self, request, name, entities, startkey=None, endkey=None,
+                 descending=False, size=None, fields=dict(), **options):
+        """Get the rows of the current page of the view, in view order,
+        which is the order of the list. The page is located by a cursor:
+        the key and id of the last row of the preceding page, or of the
+        first row of the following page when going back, so that the view
+        index is used directly, skipping only the cursor row itself.
+        'startkey' and 'endkey' limit the list; 'fields' are passed on
+        in the navigation links. A cursor key without id is a bad request.
+        Return the tuple (rows, HTML navigation or None)."""
+        size = self.get_page_size(request, default=size)
+        try:
+            key = json.loads(request.get('page_key') or 'null')
+        except ValueError:
+            raise HTTP_BAD_REQUEST('invalid page key')
+        previous = request.get('page_dir') == 'previous'
+        if key is None:
+            options['descending'] = descending
+            if startkey is not None:
+                options['startkey'] = startkey
+            if endkey is not None:
+                options['endkey'] = endkey
+        else:
+            docid = request.get('page_docid')
+            if not docid:
+                raise HTTP_BAD_REQUEST('incomplete page cursor')
+            options['startkey'] = key
+            options['startkey_docid'] = docid
+            options['skip'] = 1
+            if previous:
+                options['descending'] = not descending
+                if startkey is not None:
+                    options['endkey'] = startkey
             else:
-                options.append(OPTION(result.key))
-        return FORM(SELECT(name='operator', *options),
-                    INPUT(type='submit', value='Select operator'),
-                    method='GET',
-                    action=configuration.get_url(entities))
-
-    def put_attachment(self, content, filename):
-        "Put the attachment onto the current document."
+                options['descending'] = descending
+                if endkey is not None:
+                    options['endkey'] = endkey
+        rows = list(self.db.view(name, limit=size + 1, **options))
+        more = len(rows) > size
+        rows = rows[:size]
+        if key is not None and previous:
+            rows.reverse()
+            has_previous, has_next = more, True
+        else:
+            has_previous, has_next = key is not None, more
+        url = configuration.get_url(entities)
+        parameters = dict(fields)
+        if request.get('page_size'):
+            parameters['page_size'] = size
+        def get_link(title, row=None, direction=None):
+            query = dict(parameters)
+            if row is not None:
+                query.update(page_key=json.dumps(row.key),
+                             page_docid=row.id,
+                             page_dir=direction)
+            query = [(k, unicode(v).encode('utf-8'))
+                     for k, v in query.iteritems()]
+            return A(title, href="%s?%s" % (url, urllib.urlencode(query)))
+        navigation = []
+        if key is not None:
+            navigation.append(get_link('First'))
+        if rows and has_previous:
+            navigation.append(get_link('Previous', rows[0], 'previous'))
+        if rows and has_next:
+            navigation.append(get_link('Next', rows[-1], 'next'))
+        if navigation:
+            return rows, P(*navigation)
+        else:
+            return rows, None
+
+    def save(self, doc):
+        """Save the document, and invalidate any cached information for it.
+        The new revision is set in the document by the save. The document
+        is refetched only if it contained inline attachment data, since
+        the attachment stubs are created by the server.
+        Return the tuple (id, rev)."""
+        id, rev = self.db.save(doc)
+        if [s for s in doc.get('_attachments', dict()).values()
+            if 'data' in s]:
+            self.refresh(doc)
+        self.set_document(doc)
+        REPLICA.apply(doc)
+        NAMES.apply(doc)
+        if doc.get('entity') == 'account':
+            AUTHENTICATION_CACHE.discard(lambda user: user.id == id)
+        if doc.get('entity') in OPERATOR_ENTITIES:
+            OPERATOR_FORM_CACHE.clear()
+        return id, rev
+
+    def refresh(self, doc):
+        "Update the document in place from the database."
+        fresh = self.db[doc['_id']]
+        doc.clear()
+        doc.update(fresh)
+
+    def put_attachment(self, content, filename, content_type=None):
+        """Put the attachment onto the current document, which is then
+        refetched to get the attachment stub."""
+        assert hasattr(self, 'doc'), "dispatcher document must be set"
+        self.db.put_attachment(self.doc,
+                               content,
+                               filename=filename,
+                               content_type=content_type)
+        self.refresh(self.doc)
+        self.set_document(self.doc)
+        REPLICA.apply(self.doc)
+
+    def delete_attachment(self, filename):
+        """Delete the attachment from the current document. The stub is
+        removed locally, since the new revision is set by the delete."""
         assert hasattr(self, 'doc'), "dispatcher document must be set"
-        self.db.put_attachment(self.doc, content, filename=filename)
+        self.db.delete_attachment(self.doc, filename)
+        stubs = dict(self.doc.get('_attachments', dict()))
+        stubs.pop(filename, None)
+        if stubs:
+            self.doc['_attachments'] = stubs
+        else:
+            self.doc.pop('_attachments', None)
+        self.set_document(self.doc)
+        REPLICA.apply(self.doc)
 
     def log(self, docid, action, initial=None, comment=None):
-        "Add a log entry for a given document."
-        self.db.save(dict(_id=utils.id_uuid(),
-                          entity='log',
-                          docid=docid,
-                          action=action,
-                          account=self.user['name'],
-                          initial=initial,
-                          comment=comment,
-                          timestamp=utils.now_iso()))
+        """Add a log entry for a given document, which must have been
+        saved already. The change is stored as a delta from the initial
+        state to the current state; see module 'history'."""
+        try:
+            current = self.documents[docid]
+        except KeyError:
+            current = self.get_document_by_id(docid)
+        if action == 'created':         # No previous entries
+            sequence, checkpoint = 1, True
+        else:
+            sequence, checkpoint = history.get_next_sequence(self.db, docid,
+                                                             initial=initial)
+        self.save(history.get_entry(docid,
+                                    action,
+                                    self.user['name'],
+                                    initial,
+                                    current,
+                                    sequence,
+                                    checkpoint,
+                                    comment=comment))
 
 
 class Id(Dispatcher):
@@ -126,7 +419,7 @@ class Id(Dispatcher):
         except KeyError:
             raise HTTP_NOT_FOUND
         try:
-            doc = self.db[id]
+            doc = self.get_document_by_id(id)
         except couchdb.ResourceNotFound:
             raise HTTP_NOT_FOUND
         try:
@@ -139,7 +432,9 @@ class Id(Dispatcher):
 
 
 class Doc(Dispatcher):
-    "Return the JSON document for the given docid."
+    """Return the JSON document for the given docid. For a log entry,
+    the states before and after its action are reconstructed from the
+    delta and shown as 'initial' and 'current'."""
 
     indent = 2                          # For development
     ## indent = None                       # For production
@@ -151,13 +446,53 @@ class Doc(Dispatcher):
         self.check_viewable(self.user)
         id = request.path_named_values['id']
         try:
-            doc = self.db[id]
+            doc = self.get_document_by_id(id)
         except couchdb.ResourceNotFound:
             raise HTTP_NOT_FOUND
+        if doc.get('entity') == 'log' and 'delta' in doc:
+            try:
+                before, after = history.get_state(self.db, id)
+            except ValueError:          # Entries not yet migrated
+                pass
+            else:
+                doc = dict(doc, initial=before, current=after)
         response['Content-Type'] = 'text/plain;charset=utf-8'
         response.append(json.dumps(doc, indent=self.indent))
 
 
+class Names(Dispatcher):
+    """Return a JSON list of the names of the entity starting with the
+    given prefix, ignoring case, for type-ahead lookup in edit forms.
+    The 'name' view is queried if the name index is not current."""
+
+    def get_viewable(self, user):
+        "As for the list pages, customers may not look up names."
+        return user.get('role') in ('admin', 'manager', 'engineer')
+
+    def GET(self, request, response):
+        self.check_viewable(self.user)
+        entity = request.path_named_values['entity']
+        prefix = request.get('prefix') or ''
+        try:
+            limit = min(int(request.get('limit') or NAMES_LOOKUP_LIMIT),
+                        NAMES_LOOKUP_LIMIT)
+        except ValueError:
+            raise HTTP_BAD_REQUEST('invalid limit')
+        if entity not in NAMES_ENTITIES:
+            raise HTTP_NOT_FOUND
+        prefix = unicode(prefix, 'utf-8', 'replace').lower()
+        if NAMES.is_current():
+            result = NAMES.search(self.db, entity, prefix, limit=limit)
+        else:
+            view = self.db.view("%s/name" % entity,
+                                startkey=prefix,
+                                endkey=prefix + NAMES_KEY_END)
+            result = [r.key for r in view if r.key.lower().startswith(prefix)]
+            result = result[:limit]
+        response['Content-Type'] = 'application/json'
+        response.append(json.dumps(result))
+
+
 class Static(Dispatcher):
     "Return a static file."
 
@@ -179,7 +514,7 @@ class Attachment(Dispatcher):
     def get_document(self, request):
         id = request.path_named_values['id']
         try:
-            self.doc = self.db[id]
+            self.doc = self.get_document_by_id(id)
         except couchdb.ResourceNotFound:
             raise HTTP_NOT_FOUND
 
@@ -218,9 +553,7 @@ class Attachment(Dispatcher):
         self.check_editable(self.user)
         filename = request.path_named_values['filename']
         initial = dict(self.doc)
-        self.db.put_attachment(self.doc,
-                               request.file.read(),
-                               filename)
+        self.put_attachment(request.file.read(), filename)
         self.log(self.doc.id,
                  'uploaded attachment',
                  initial=initial,
@@ -232,7 +565,7 @@ class Attachment(Dispatcher):
         self.check_editable(self.user)
         filename = request.path_named_values['filename']
         initial = dict(self.doc)
-        self.db.delete_attachment(self.doc, filename)
+        self.delete_attachment(filename)
         self.log(self.doc.id,
                  'deleted attachment',
                  initial=initial,
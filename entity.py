@@ -6,12 +6,41 @@ Per Kraulis
 2011-02-08
 """
 
-import logging, os.path, base64, quopri
+import logging, os.path, base64, quopri, functools
 
 from wireframe.response import *
 
 from .dispatcher import *
 from .fields import *
+from .cache import Cache
+
+
+# Serialized HTML fragments of entity pages, keyed by document id and
+# revision, viewer role and edit privilege, entity class and fragment name.
+# A new revision gives new keys; the old items are evicted eventually.
+FRAGMENT_CACHE = Cache(size=getattr(configuration.site,
+                                    'FRAGMENT_CACHE_SIZE', 2000))
+
+
+class Fragment(object):
+    "Collects the output of an entity view method, for the fragment cache."
+
+    def __init__(self):
+        self.state = []
+        self.meta = []
+
+    def append(self, elem):
+        self.state.append(elem)
+
+
+def cached_view(method):
+    """Decorator for an entity view method whose output depends only on
+    the document revision and the viewer; see 'Entity.view_cached'."""
+    @functools.wraps(method)
+    def wrapper(self, page):
+        self.view_cached(page, method.__name__,
+                         lambda fragment: method(self, fragment))
+    return wrapper
 
 
 class Entity(Dispatcher):
@@ -64,6 +93,9 @@ class Entity(Dispatcher):
             self.doc = self.get_named_document(entity, name)
         except ValueError:
             raise HTTP_NOT_FOUND("entity %s %s" % (entity, name))
+        # Position in the log list; key of the newest entry to show
+        self.log_cursor = (request.get('log_timestamp'),
+                           request.get('log_docid'))
 
     def GET(self, request, response):
         self.check_viewable(self.user)
@@ -103,17 +135,58 @@ class Entity(Dispatcher):
         self.view_tags(page)
         self.view_xrefs(page)
 
+    def get_fragment_key(self, name):
+        "Return the key in the fragment cache for the named fragment."
+        return (self.doc.id,
+                self.doc.rev,
+                self.user.get('role'),
+                self.get_editable(self.user),
+                self.__class__.__name__,
+                name)
+
+    def get_cached_html(self, name, render):
+        """Return the serialized HTML of the named fragment, from the cache
+        if rendered before for the same revision and viewer."""
+        key = self.get_fragment_key(name)
+        html = FRAGMENT_CACHE.get(key)
+        if html is None:
+            html = str(render())
+            FRAGMENT_CACHE.set(key, html)
+        return html
+
+    def view_cached(self, page, name, method):
+        """Add the output of the view method to the page, from the cache
+        if rendered before for the same revision and viewer. The method
+        may only use 'append' and 'meta' of the page."""
+        key = self.get_fragment_key(name)
+        value = FRAGMENT_CACHE.get(key)
+        if value is None:
+            fragment = Fragment()
+            method(fragment)
+            value = ([str(e) for e in fragment.state],
+                     [str(e) for e in fragment.meta])
+            FRAGMENT_CACHE.set(key, value)
+        page.state.extend(value[0])
+        page.meta.extend(value[1])
+
     def view_fields(self, page):
-        "HTML for the entity data fields."
+        """HTML for the entity data fields. The rows for fields whose view
+        depends only on this document are cached."""
         page.append(H2('Information'))
         rows = []
         for field in self.fields:
-            rows.append(TR(TH(field.name),
-                           TD(field.get_view(self)),
-                           TD(field.get_edit_button(self)),
-                           TD(field.get_description())))
+            render = lambda field=field: TR(TH(field.name),
+                                            TD(field.get_view(self)),
+                                            TD(field.get_edit_button(self)),
+                                            TD(field.get_description()))
+            if field.cacheable:
+                rows.append(self.get_cached_html("field %s" % field.name,
+                                                 render))
+            else:
+                rows.append(render())
         page.append(TABLE(border=1, *rows))
 
+    @cached_view
     def view_attachments(self, page):
         "HTML for the attachments list."
         page.append(H2('Attachments'))
@@ -143,7 +216,7 @@ class Entity(Dispatcher):
         rows = []
         for tool_class in self.tool_classes:
             tool = tool_class(self)
-            disabled = not tool.is_enabled(self.doc)
+            disabled = not tool.check_enabled(self.doc)
             rows.append(TR(TH(str(tool)),
                            TD(FORM(INPUT(type='submit', value='Apply',
                                          disabled=disabled),
@@ -157,27 +230,51 @@ class Entity(Dispatcher):
         page.append(TABLE(*rows))
 
     def view_log(self, page):
-        "HTML for the log list."
+        """HTML for the log list. Only the newest LOG_PAGE_SIZE entries
+        from the cursor position are shown, using the columns emitted by
+        the view. The log document, containing the snapshot of the entity,
+        is loaded only when its link is followed."""
+        size = getattr(configuration.site, 'LOG_PAGE_SIZE', 20)
+        timestamp, docid = self.log_cursor
         rows = [TR(TH('Action'),
                    TH('Account'),
                    TH('Timestamp'),
                    TH('Comment'),
                    TH('Log document'))]
-        view = self.db.view('log/docid_timestamp',
-                            descending=True,
-                            include_docs=True)
-        for result in view[[self.doc.id, 'Z']:[self.doc.id, '']]:
-            doc = result.doc
-            rows.append(TR(TD(doc['action']),
-                           TD(A(doc['account'],
-                                href=configuration.get_url('account',
-                                                           doc['account']))),
-                           TD(doc['timestamp']),
-                           TD(doc.get('comment') or ''),
-                           TD(A(doc.id,
-                                href=configuration.get_url('doc', doc.id)))))
+        options = dict(descending=True,
+                       startkey=[self.doc.id, timestamp or 'Z'],
+                       endkey=[self.doc.id, ''],
+                       limit=size + 1)
+        if timestamp and docid:
+            options['startkey_docid'] = docid
+        results = list(self.db.view('log/docid_timestamp', **options))
+        for result in results[:size]:
+            value = result.value
+            account = value.get('account')
+            if account:
+                account = A(account,
+                            href=configuration.get_url('account', account))
+            rows.append(TR(TD(value.get('action') or ''),
+                           TD(account or ''),
+                           TD(result.key[1]),
+                           TD(value.get('comment') or ''),
+                           TD(A(result.id,
+                                href=configuration.get_url('doc', result.id)))))
+        navigation = []
+        if timestamp:
+            navigation.append(A('Newest', href=self.get_url()))
+        if len(results) > size:
+            older = results[size]
+            navigation.append(FORM(INPUT(type='submit', value='Show older'),
+                                   INPUT(type='hidden', name='log_timestamp',
+                                         value=older.key[1]),
+                                   INPUT(type='hidden', name='log_docid',
+                                         value=older.id),
+                                   method='GET',
+                                   action=self.get_url()))
         page.log = DIV(H2('Log'),
-                       TABLE(border=1, *rows))
+                       TABLE(border=1, *rows),
+                       *navigation)
 
     def view_locked(self, page):
         if self.locked:
@@ -195,6 +292,7 @@ class Entity(Dispatcher):
                                      method='POST',
                                      action=self.get_url()))))
 
+    @cached_view
     def view_tags(self, page):
         tags = self.doc.get('tags', [])
         if self.get_editable(self.user):
@@ -217,6 +315,7 @@ class Entity(Dispatcher):
             rows.append(TR(TD(tag)))
         page.meta.append(DIV(TABLE(klass='tags', *rows)))
 
+    @cached_view
     def view_xrefs(self, page):
         xrefs = self.doc.get('xrefs', [])
         if self.get_editable(self.user):
@@ -361,7 +460,10 @@ class Entity(Dispatcher):
                                      action=self.get_url())))))
 
     def POST(self, request, response):
-        "Modify according to which CGI inputs were provided."
+        """Modify according to which CGI inputs were provided.
+        All modifications are made in memory, and saved as one revision
+        of the document, including any attachment changes, with one
+        combined log entry."""
         # Check edit privilege
         self.check_editable(self.user, check_lock=False)
         self.check_revision(request)
@@ -373,6 +475,8 @@ class Entity(Dispatcher):
             initial = None
 
         modified = []                   # Names of fields that were modified
+        actions = []                    # Descriptions for the log entry
+        comments = []
 
         try:
             locked = request.cgi_fields['locked'].value.lower()
@@ -404,26 +508,21 @@ class Entity(Dispatcher):
                     modified.append(field.name)
         if modified:
             if initial is None:
-                action = 'created'
+                actions.append('created')
             else:
-                action = "modified %s" % ', '.join(modified)
+                actions.append("modified %s" % ', '.join(modified))
             map(self.on_field_modified, modified)
-            id, rev = self.db.save(self.doc) # Create or update
-            self.doc = self.db[id]           # Get fresh instance
-            self.log(self.doc.id, action, initial=initial)
+
+        # Attachments are changed inline in the document; a new dictionary
+        # is needed, since the initial state refers to the old one.
+        stubs = dict(self.doc.get('_attachments', dict()))
 
         # Delete attachments
-        stubs = self.doc.get('_attachments', dict())
         for filename in request.cgi_fields.getlist('_attachment_delete'):
             if stubs.has_key(filename):
-                initial = dict(self.doc)
-                self.db.delete_attachment(self.doc, filename)
-                self.doc = self.db[self.doc.id] # Get fresh instance
-                comment = "filename %s" % filename
-                self.log(self.doc.id,
-                         'deleted attachment',
-                         initial=initial,
-                         comment=comment)
+                del stubs[filename]
+                actions.append('deleted attachment')
+                comments.append("filename %s" % filename)
 
         # Upload attachment
         try:
@@ -432,7 +531,6 @@ class Entity(Dispatcher):
         except KeyError:
             pass
         else:
-            initial = dict(self.doc)
             filename = os.path.basename(field.filename)
             content = field.file.read()
             try:
@@ -444,34 +542,26 @@ class Entity(Dispatcher):
                     content = base64.standard_b64decode(content)
                 elif encoding == 'quoted-printable':
                     content = quopri.decodestring(content)
-            self.db.put_attachment(self.doc,
-                                   content,
-                                   filename,
-                                   field.type)
-            self.doc = self.db[self.doc.id] # Get fresh instance
-            comment = "filename %s" % filename
-            self.log(self.doc.id,
-                     'uploaded attachment',
-                     initial=initial,
-                     comment=comment)
+            stubs[filename] = dict(content_type=field.type,
+                                   data=base64.standard_b64encode(content))
+            actions.append('uploaded attachment')
+            comments.append("filename %s" % filename)
+
+        if stubs != self.doc.get('_attachments', dict()):
+            if stubs:
+                self.doc['_attachments'] = stubs
+            else:
+                self.doc.pop('_attachments', None)
 
         # Remove tags
-        initial = dict(self.doc)
         tags = set(self.doc.get('tags', []))
         original = tags.copy()
         for tag in request.cgi_fields.getlist('_tag_remove'):
             tags.discard(tag)
         if tags != original:
-            self.doc['tags'] = list(tags)
-            id, rev = self.db.save(self.doc) # Create or update
-            self.doc = self.db[id]           # Get fresh instance
-            self.log(self.doc.id,
-                     'removed tags',
-                     initial=initial)
+            actions.append('removed tags')
 
         # Add tags
-        initial = dict(self.doc)
-        tags = set(self.doc.get('tags', []))
         original = tags.copy()
         try:
             new = request.cgi_fields['_tags_add'].value.strip()
@@ -482,38 +572,23 @@ class Entity(Dispatcher):
             for tag in new.split():
                 tags.add(tag)
             if tags != original:
-                self.doc['tags'] = list(tags)
-                id, rev = self.db.save(self.doc) # Create or update
-                self.doc = self.db[id]           # Get fresh instance
-                self.log(self.doc.id,
-                         'added tags',
-                         initial=initial)
+                actions.append('added tags')
+        if tags != set(self.doc.get('tags', [])):
+            self.doc['tags'] = list(tags)
 
         # Remove xrefs
-        initial = dict(self.doc)
         xrefs = dict([(x['uri'], x.get('title'))
                       for x in self.doc.get('xrefs', [])])
-        original = xrefs.copy()
+        initial_xrefs = xrefs.copy()
         for uri in request.cgi_fields.getlist('_xref_remove'):
             try:
                 del xrefs[uri]
             except KeyError:
                 pass
-        if xrefs != original:
-            result = []
-            for uri, title in sorted(xrefs.items()):
-                result.append(dict(uri=uri, title=title))
-            self.doc['xrefs'] = result
-            id, rev = self.db.save(self.doc) # Create or update
-            self.doc = self.db[id]           # Get fresh instance
-            self.log(self.doc.id,
-                     'removed xrefs',
-                     initial=initial)
+        if xrefs != initial_xrefs:
+            actions.append('removed xrefs')
 
         # Add xrefs
-        initial = dict(self.doc)
-        xrefs = dict([(x['uri'], x.get('title'))
-                      for x in self.doc.get('xrefs', [])])
         original = xrefs.copy()
         try:
             uri = request.cgi_fields['_xref_add_uri'].value.strip()
@@ -528,15 +603,20 @@ class Entity(Dispatcher):
                 title = None
             xrefs[uri] = title
             if xrefs != original:
-                result = []
-                for uri, title in sorted(xrefs.items()):
-                    result.append(dict(uri=uri, title=title))
-                self.doc['xrefs'] = result
-                id, rev = self.db.save(self.doc) # Create or update
-                self.doc = self.db[id]           # Get fresh instance
-                self.log(self.doc.id,
-                         'added xref',
-                         initial=initial)
+                actions.append('added xref')
+        if xrefs != initial_xrefs:
+            result = []
+            for uri, title in sorted(xrefs.items()):
+                result.append(dict(uri=uri, title=title))
+            self.doc['xrefs'] = result
+
+        # Save all modifications as one revision, with one log entry
+        if actions:
+            self.save(self.doc)         # Create or update
+            self.log(self.doc.id,
+                     '; '.join(actions),
+                     initial=initial,
+                     comment=', '.join(comments) or None)
 
         # Perform specified actions, if any:
         # The action "X" causes the method "action_X" to be executed
@@ -625,7 +705,7 @@ class EntityCreate(Dispatcher):
         doc.update(dict(_id=utils.id_uuid(),
                         entity=entity,
                         timestamp=utils.now_iso()))
-        id, rev = self.db.save(doc)
+        id, rev = self.save(doc)
         self.log(id, 'created', initial=None)
         raise HTTP_SEE_OTHER(Location=self.get_url(doc['name']))
 
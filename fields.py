@@ -18,6 +18,8 @@ from . import configuration, utils
 class Field(object):
     "Abstract data field."
 
+    cacheable = True                    # Is the view given by the doc only?
+
     def __init__(self, name,
                  required=False, fixed=False, default=None,
                  description=None):
@@ -436,8 +438,25 @@ class PasswordField(StringField):
         return utils.hexdigest(new)
 
 
+def get_typeahead_field(name, referred, value='', multiple=False):
+    """Return a text input field with type-ahead lookup of the names of
+    the referred entity. If 'multiple', then the names are separated by
+    blanks."""
+    url = configuration.get_url('names', referred)
+    return DIV(INPUT(type='text', name=name, id=name, value=value or '',
+                     size=40, autocomplete='off'),
+               DIV(id="%s_matches" % name, klass='typeahead'),
+               SCRIPT(type='text/javascript',
+                      src=configuration.get_url('static', 'typeahead.js')),
+               SCRIPT("typeahead('%s', '%s', %s);" %
+                      (name, url, multiple and 'true' or 'false'),
+                      type='text/javascript'))
+
+
 class ReferenceField(Field):
-    "Reference to an entity of a specified type."
+    """Reference to an entity of a specified type. If there are more
+    than REFERENCE_SELECT_MAX entities of the type, then the edit form
+    field is a text input with type-ahead lookup instead of a select."""
 
     def __init__(self, name, referred,
                  required=False, fixed=False, default=None,
@@ -461,6 +480,9 @@ class ReferenceField(Field):
             value = entity.doc.get(self.name)
         except AttributeError:          # '.doc' not set when creating
             value = self.default
+        if entity.get_names_count(self.referred) > \
+               getattr(configuration.site, 'REFERENCE_SELECT_MAX', 200):
+            return get_typeahead_field(self.name, self.referred, value)
         # XXX how to filter the set of referenced entities appropriately?
         if self.required:
             options = []
@@ -469,13 +491,23 @@ class ReferenceField(Field):
                 options = [OPTION('', value='__none__', selected=True)]
             else:
                 options = [OPTION('', value='__none__')]
-        for result in entity.db.view("%s/name" % self.referred):
-            if result.key == value:
-                options.append(OPTION(result.key, selected=True))
+        for name in entity.get_names(self.referred):
+            if name == value:
+                options.append(OPTION(name, selected=True))
             else:
-                options.append(OPTION(result.key))
+                options.append(OPTION(name))
         return SELECT(name=self.name, *options)
 
+    def check_value(self, dispatcher, value):
+        "Check that the referred entity exists."
+        value = super(ReferenceField, self).check_value(dispatcher, value)
+        if value is not None:
+            try:
+                dispatcher.get_named_document(self.referred, value)
+            except ValueError:
+                raise ValueError("entity '%s' does not exist" % value)
+        return value
+
 
 class ReferenceListField(ReferenceField):
     "List of references to entities of a specified type."
@@ -495,12 +527,17 @@ class ReferenceListField(ReferenceField):
         except AttributeError:          # '.doc' not set when creating
             names = []
         current = set(names)
-        options = []
-        view = entity.db.view("%s/name" % self.referred)
-        for row in view:
-            if row.key not in current:
-                options.append(OPTION(row.key))
-        add = SELECT(name="%s_add" % self.name, size=4, multiple=True, *options)
+        if entity.get_names_count(self.referred) > \
+               getattr(configuration.site, 'REFERENCE_SELECT_MAX', 200):
+            add = get_typeahead_field("%s_add" % self.name, self.referred,
+                                      multiple=True)
+        else:
+            options = []
+            for name in entity.get_names(self.referred):
+                if name not in current:
+                    options.append(OPTION(name))
+            add = SELECT(name="%s_add" % self.name, size=4, multiple=True,
+                         *options)
         remove = TABLE(*[TR(TD(INPUT(type='checkbox',
                                      name="%s_remove" % self.name,
                                      value=name)),
@@ -521,7 +558,7 @@ class ReferenceListField(ReferenceField):
         for value in request.cgi_fields.getlist("%s_remove" % self.name):
             names.discard(value.strip())
         for value in request.cgi_fields.getlist("%s_add" % self.name):
-            names.add(value.strip())
+            names.update(value.split()) # Several from type-ahead field
         names = self.check_value(dispatcher, names)
         if set(names) == orig_names:
             raise KeyError("entities '%s' not changed" % self.name)
@@ -530,17 +567,17 @@ class ReferenceListField(ReferenceField):
     def check_value(self, dispatcher, value):
         "Convert to list of entity names, and check that they exist."
         names = list(value)
-        for name in names:
-            try:
-                dispatcher.get_named_document(self.referred, name)
-            except ValueError:
-                raise ValueError("entity '%s' does not exist" % name)
+        docs, missing = dispatcher.get_named_documents(self.referred, names)
+        if missing:
+            raise ValueError("entity '%s' does not exist" % missing[0])
         return names
 
 
 class SampleSetField(Field):
     "Set of sample references; for Workset."
 
+    cacheable = False                   # View shows data of sample docs
+
     def get_view(self, entity):
         samples = entity.doc.get(self.name)
         if not samples: return ''
@@ -553,8 +590,9 @@ class SampleSetField(Field):
             arranged_samples = entity.get_arranged_samples()
         except AttributeError:
             arranged_samples = dict()
+        docs, missing = entity.get_named_documents('sample', samples)
         for sample in samples:
-            doc = entity.get_named_document('sample', sample)
+            doc = docs.get(sample) or dict()
             url = configuration.get_url('sample', sample)
             multiplex = doc.get('multiplex_label') or ''
             value = doc.get('multiplex_sequence')
@@ -585,8 +623,9 @@ class SampleSetField(Field):
                 arranged_samples = entity.get_arranged_samples()
             except AttributeError:
                 arranged_samples = dict()
+            docs, missing = entity.get_named_documents('sample', samples)
             for sample in samples:
-                doc = entity.get_named_document('sample', sample)
+                doc = docs.get(sample) or dict()
                 multiplex = []
                 value = doc.get('multiplex_label')
                 if value: multiplex.append(value)
@@ -677,10 +716,9 @@ class SampleSetField(Field):
             updated_samples.discard(sample)
 
         # Check that samples in workset actually exist
-        view = dispatcher.db.view('sample/name')
-        for sample in list(updated_samples):
-            if not view[sample]:
-                updated_samples.discard(sample)
+        docs, missing = dispatcher.get_named_documents('sample',
+                                                       updated_samples)
+        updated_samples.difference_update(missing)
 
         # If no change, then act as if this CGI input was not present at all
         if orig_samples == updated_samples:
@@ -0,0 +1,234 @@
+""" slog: Simple sample tracker system.
+
+Delta-encoded entity states in the log entries, and reconstruction
+of past states of an entity.
+
+A log entry stores the change made by its action as a structural delta
+from the state before the action to the state after it. The entries of
+a document are numbered by a sequence starting at 1. The first entry,
+and then every LOG_CHECKPOINT_INTERVAL entries, is a checkpoint which
+also stores the full state before the action ('initial'). A past state
+is rebuilt by applying the deltas forward from the nearest preceding
+checkpoint, which is at most LOG_CHECKPOINT_INTERVAL entries back.
+The entries of a document are ordered by timestamp and sequence number.
+
+Log entries in the old format store only the full 'initial' state;
+they are converted by 'misc/migrate_log.py'.
+
+Per Kraulis
+2011-04-10
+"""
+
+import json, copy, difflib
+
+from . import configuration, utils
+
+
+CHECKPOINT_INTERVAL = getattr(configuration.site,
+                              'LOG_CHECKPOINT_INTERVAL', 20)
+
+
+def get_delta(old, new):
+    """Return the structural delta which transforms the old value into
+    the new value, or None if they are equal."""
+    if old == new: return None
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = dict()
+        for key, value in new.iteritems():
+            if key in old:
+                delta = get_delta(old[key], value)
+                if delta is not None:
+                    changed[key] = delta
+            else:
+                changed[key] = dict(value=value)
+        removed = sorted([k for k in old if k not in new])
+        result = dict()
+        if changed:
+            result['dict'] = changed
+        if removed:
+            result['removed'] = removed
+        return result
+    if isinstance(old, list) and isinstance(new, list):
+        # Compare the items in JSON form, since they may be unhashable
+        matcher = difflib.SequenceMatcher(None,
+                                          [json.dumps(i, sort_keys=True)
+                                           for i in old],
+                                          [json.dumps(i, sort_keys=True)
+                                           for i in new],
+                                          autojunk=False)
+        edits = [[i1, i2, new[j1:j2]]
+                 for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+                 if tag != 'equal']
+        return dict(list=edits)
+    return dict(value=new)
+
+def apply_delta(value, delta):
+    "Return the new value given by applying the delta to the value."
+    if delta is None:
+        return copy.deepcopy(value)
+    if 'value' in delta:
+        return copy.deepcopy(delta['value'])
+    if 'list' in delta:
+        result = list(value)
+        for i1, i2, items in reversed(delta['list']):
+            result[i1:i2] = copy.deepcopy(items)
+        return result
+    result = dict(value)
+    for key in delta.get('removed', []):
+        result.pop(key, None)
+    for key, subdelta in delta.get('dict', dict()).iteritems():
+        result[key] = apply_delta(result.get(key), subdelta)
+    return result
+
+def get_next_sequence(db, docid, initial=None,
+                      interval=CHECKPOINT_INTERVAL):
+    """Return the tuple (sequence number, checkpoint flag) for the next
+    log entry of the document. A checkpoint is required also if the
+    initial state is not the revision after the last entry, since the
+    document has then been changed without a log entry."""
+    view = db.view('log/docid_sequence',
+                   descending=True,
+                   startkey=[docid, dict()],
+                   endkey=[docid, 0],
+                   limit=1)
+    rows = list(view)
+    if not rows:
+        return 1, True
+    sequence = rows[0].key[1] + 1
+    checkpoint = (sequence - 1) % interval == 0 or \
+                 (initial or dict()).get('_rev') != rows[0].value.get('rev')
+    return sequence, checkpoint
+
+def get_entry(docid, action, account, initial, current,
+              sequence, checkpoint, comment=None, timestamp=None):
+    """Return a new log entry document for the action which changed
+    the document from the initial state to the current state."""
+    entry = dict(_id=utils.id_uuid(),
+                 entity='log',
+                 docid=docid,
+                 action=action,
+                 account=account,
+                 comment=comment,
+                 timestamp=timestamp or utils.now_iso(),
+                 sequence=sequence,
+                 rev=current.get('_rev'),
+                 delta=get_delta(initial or dict(), current))
+    if checkpoint:
+        entry['checkpoint'] = True
+        entry['initial'] = initial
+    return entry
+
+def get_order_key(entry):
+    "Return the key to order the log entries of a document by."
+    return (entry['timestamp'], entry.get('sequence') or 0)
+
+def get_states(entries):
+    """Return the list of tuples (entry, state before, state after) for
+    the log entries of a document, ordered by 'get_order_key'. The first
+    entry must be a checkpoint. The state before a creation is None."""
+    result = []
+    state = None
+    for entry in entries:
+        if 'delta' not in entry:
+            raise ValueError("log entry %s not migrated" % entry['_id'])
+        if entry.get('checkpoint'):
+            before = entry.get('initial')
+        elif not result:
+            raise ValueError("log entry %s not a checkpoint" % entry['_id'])
+        else:
+            before = state
+        state = apply_delta(before or dict(), entry['delta'])
+        result.append((entry, before, state))
+    return result
+
+def get_log_entries(db, docid):
+    "Return all log entries for the document, in order."
+    view = db.view('log/docid_timestamp',
+                   include_docs=True,
+                   startkey=[docid, ''],
+                   endkey=[docid, 'Z'])
+    entries = [r.doc for r in view]
+    entries.sort(key=get_order_key)
+    return entries
+
+def get_entries(db, docid, sequence, interval=CHECKPOINT_INTERVAL):
+    """Return the log entries of the document from the nearest checkpoint
+    up to and including the one with the given sequence number.
+    Checkpoints written before the spacing was kept by sequence number
+    may be further back than the interval."""
+    options = dict(descending=True,
+                   startkey=[docid, sequence],
+                   endkey=[docid, 0])
+    rows = list(db.view('log/docid_sequence', limit=interval, **options))
+    if not [r for r in rows if r.value.get('checkpoint')]:
+        rows = list(db.view('log/docid_sequence', **options))
+    ids = []
+    for row in rows:
+        ids.insert(0, row.id)
+        if row.value.get('checkpoint'): break
+    view = db.view('_all_docs', keys=ids, include_docs=True)
+    return sorted([r.doc for r in view], key=get_order_key)
+
+def get_state(db, logid):
+    """Return the tuple (state before, state after) for the action of the
+    given log entry. Only the entries from the nearest preceding
+    checkpoint are loaded."""
+    entry = db[logid]
+    if not entry.get('sequence'):
+        raise ValueError("log entry %s not migrated" % logid)
+    entries = get_entries(db, entry['docid'], entry['sequence'])
+    entry, before, after = get_states(entries)[-1]
+    return before, after
+
+def get_revision(db, docid, rev):
+    """Return the state of the document at the given revision, as
+    reconstructed from its log. Return None if not found. Only the
+    entries from the nearest checkpoint preceding it are loaded."""
+    view = db.view('log/docid_sequence',
+                   startkey=[docid, 0],
+                   endkey=[docid, dict()])
+    for row in view:
+        if row.value.get('rev') == rev:
+            entries = get_entries(db, docid, row.key[1])
+            entry, before, after = get_states(entries)[-1]
+            return after
+    return None
+
+def get_legacy_states(entries, current):
+    """Return the list of tuples (entry, state before, state after) for
+    log entries some of which may be in the old format, containing only
+    the full state before the action. The old entries precede the others.
+    The state after an old entry is the state before the next entry,
+    or the current document for the last entry. An old entry without
+    state before is assumed not to have changed the document, unless
+    it is a creation."""
+    legacy = [e for e in entries if 'delta' not in e]
+    result = get_states([e for e in entries if 'delta' in e])
+    if result:
+        following = result[0][1]
+    else:
+        following = current
+    for entry in reversed(legacy):
+        before = entry.get('initial')
+        if before is None and entry.get('action') != 'created':
+            before = following
+        result.insert(0, (entry, before, following))
+        following = before
+    return result
+
+def encode_entries(states, interval=CHECKPOINT_INTERVAL):
+    """Return the log entries for the given states, delta-encoded with
+    sequence numbers, and checkpoints at the given interval."""
+    result = []
+    for pos, (entry, before, after) in enumerate(states):
+        entry = dict(entry)
+        entry.pop('initial', None)
+        entry.pop('checkpoint', None)
+        entry['sequence'] = pos + 1
+        entry['rev'] = (after or dict()).get('_rev')
+        entry['delta'] = get_delta(before or dict(), after or dict())
+        if pos % interval == 0:
+            entry['checkpoint'] = True
+            entry['initial'] = before
+        result.append(entry)
+    return result
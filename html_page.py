@@ -2,31 +2,37 @@
 
 Standard HTML page.
 
+The user-independent parts of the page (head, logo, navigation, search
+form and the table layout) are serialized once per worker process into
+a template, into which the per-request parts are spliced. The rows of
+a StreamedTable are serialized one at a time and streamed to the client.
+
 Per Kraulis
 2011-02-02
 """
 
+import re
+
 from HyperText.HTML40 import *
 
-from . import configuration
+from . import configuration, utils
+from .streaming import set_stream
+
+
+# Marker for a per-request part in the page template.
+MARKER = "@@%s@@"
+MARKER_RX = re.compile(r'@@(\w+)@@')
 
 
 class HtmlPage(object):
     "Standard HTML page."
 
+    skeleton = None                     # Template parts; see 'get_skeleton'
+    search_form = None                  # Serialized search form
+
     def __init__(self, dispatcher, title='slog'):
         self.dispatcher = dispatcher
-        self.head_meta = [META(content='text/html; charset=utf-8',
-                               http_equiv='Content-Type'),
-                          META(content='application/javascript',
-                               http_equiv='Content-Script-Type')]
         self.title = title
-        self.stylesheet = configuration.get_url('static', 'style.css')
-        self.style = "form {padding:0; margin:0}"
-        self.logo = A(IMG(src=configuration.get_url('static', 'slog.png'),
-                          width="107", height="100",
-                          alt="slog %s" % configuration.VERSION),
-                      href=configuration.site.URL_BASE)
         self.set_header()
         # Logout is possible only for Firefox, Safari and Opera
         logout = False
@@ -38,13 +44,58 @@ class HtmlPage(object):
                     break
         self.set_login(logout=logout)
         self.set_search()
-        self.set_navigation()
         self.state = []                 # Current state of the entity
         self.lock = ''
         self.meta = []
         self.log = ''
         self.context = "slog %s" % configuration.VERSION
 
+    @classmethod
+    def get_skeleton(cls):
+        """Return the list of the parts of the page template: alternately
+        serialized static HTML and the name of a per-request part.
+        It is created once per worker process."""
+        if cls.skeleton is None:
+            head = HEAD(META(content='text/html; charset=utf-8',
+                             http_equiv='Content-Type'),
+                        META(content='application/javascript',
+                             http_equiv='Content-Script-Type'),
+                        TITLE(MARKER % 'title'),
+                        LINK(rel='stylesheet',
+                             href=configuration.get_url('static',
+                                                        'style.css'),
+                             type='text/css'))
+            logo = A(IMG(src=configuration.get_url('static', 'slog.png'),
+                         width="107", height="100",
+                         alt="slog %s" % configuration.VERSION),
+                     href=configuration.site.URL_BASE)
+            rows = []
+            for entities in ['Accounts',
+                             'Projects',
+                             'Samples',
+                             'Worksets',
+                             'Protocols',
+                             'Tasks',
+                             'Instruments']:
+                rows.append(TR(TD(A(entities,
+                                    href=configuration.get_url(
+                                        entities.lower())))))
+            body = BODY(TABLE(TR(TH(logo, width='8%'),
+                                 TD(MARKER % 'header'),
+                                 TD(TABLE(TR(TD(MARKER % 'login')),
+                                          TR(TD(MARKER % 'search')),
+                                          TR(TD(MARKER % 'lock'))))),
+                              TR(TD(TABLE(*rows), rowspan=2),
+                                 TD(MARKER % 'state'),
+                                 TD(MARKER % 'meta', rowspan=2)),
+                              TR(TD(MARKER % 'log')),
+                              TR(TD(HR(), colspan=3)),
+                              TR(TD(MARKER % 'context', colspan=3)),
+                              klass='body',
+                              width='100%'))
+            cls.skeleton = MARKER_RX.split(str(HTML(head, body)))
+        return cls.skeleton
+
     def set_header(self):
         self.header = H1(self.title)
 
@@ -62,23 +113,15 @@ class HtmlPage(object):
         self.login = DIV(msg)
 
     def set_search(self):
-        self.search = FORM(INPUT(type='text', name='key'),
-                           INPUT(type='submit', value='Search'),
-                           method='GET',
-                           action=configuration.get_url('search'))
-
-    def set_navigation(self):
-        rows = []
-        for entities in ['Accounts',
-                         'Projects',
-                         'Samples',
-                         'Worksets',
-                         'Protocols',
-                         'Tasks',
-                         'Instruments']:
-            rows.append(TR(TD(A(entities,
-                                href=configuration.get_url(entities.lower())))))
-        self.navigation = TABLE(*rows)
+        "Set the search form, serialized once per worker process."
+        if HtmlPage.search_form is None:
+            HtmlPage.search_form = str(FORM(INPUT(type='text', name='key'),
+                                            INPUT(type='submit',
+                                                  value='Search'),
+                                            method='GET',
+                                            action=configuration.get_url(
+                                                'search')))
+        self.search = HtmlPage.search_form
 
     def set_context(self, doc):
         "Set the standard context information for a document."
@@ -89,6 +132,22 @@ class HtmlPage(object):
                               doc.rev,
                               doc.get('timestamp', '?')))
 
+    def get_context(self):
+        """Return the context information. For the 'admin' role, include
+        the summary of database calls, if the database is instrumented,
+        and the counters of the reStructuredText cache."""
+        try:
+            summary = self.dispatcher.db.get_summary_line()
+        except AttributeError:
+            return self.context
+        self.dispatcher.db.log(self.title)
+        if self.dispatcher.user.get('role') != 'admin':
+            return self.context
+        stats = utils.get_rst_stats()
+        rst = "rst cache: %(hits)i hits, %(misses)i misses," \
+              " %(saved).1f s saved" % stats
+        return DIV(self.context, DIV(summary), DIV(rst))
+
     def append(self, elem):
         "Append an HTML element to the list of info items."
         self.state.append(elem)
@@ -97,29 +156,55 @@ class HtmlPage(object):
         "Create the page contents."
         raise NotImplementedError
 
+    def get_chunks(self):
+        """Generate the page as serialized chunks. The rows of a streamed
+        table are serialized one at a time. The context is produced last,
+        so that it covers all database calls."""
+        for pos, part in enumerate(self.get_skeleton()):
+            if not pos % 2:
+                yield part
+            elif part == 'state':
+                for item in self.state:
+                    if isinstance(item, StreamedTable):
+                        head, tail = str(DIV(MARKER % 'item')).split(
+                            MARKER % 'item')
+                        yield head
+                        for chunk in item.get_chunks():
+                            yield chunk
+                        yield tail
+                    else:
+                        yield str(DIV(item))
+            elif part == 'meta':
+                yield ''.join([str(m) for m in self.meta])
+            elif part == 'context':
+                yield str(self.get_context())
+            else:
+                yield str(getattr(self, part))
+
     def write(self, response):
-        head = HEAD(*self.head_meta)
-        head.append(TITLE(self.title))
-        if self.stylesheet:
-            head.append(LINK(rel='stylesheet',
-                             href=self.stylesheet,
-                             type='text/css'))
-        elif self.style:
-            head.append(STYLE(self.style, type='text/css'))
-        state = [DIV(s) for s in self.state]
-        body = BODY(TABLE(TR(TH(self.logo, width='8%'),
-                             TD(self.header),
-                             TD(TABLE(TR(TD(self.login)),
-                                      TR(TD(self.search)),
-                                      TR(TD(self.lock))))),
-                          TR(TD(self.navigation, rowspan=2),
-                             TD(*state),
-                             TD(rowspan=2, *self.meta)),
-                          TR(TD(self.log)),
-                          TR(TD(HR(), colspan=3)),
-                          TR(TD(self.context, colspan=3)),
-                          klass='body',
-                          width='100%'))
-        html = HTML(head, body)
+        """Write the page. If it contains a streamed table, then the chunks
+        are streamed after the headers, instead of appended as a whole."""
         response['Content-Type'] = 'text/html'
-        response.append(str(html))
+        if [s for s in self.state if isinstance(s, StreamedTable)]:
+            set_stream(self.dispatcher.environ, self.get_chunks())
+        else:
+            response.append(''.join(self.get_chunks()))
+
+
+class StreamedTable(object):
+    """Table whose rows are produced by an iterable, such as a generator,
+    and serialized one at a time when the page is written."""
+
+    def __init__(self, header, rows, **attributes):
+        self.header = header
+        self.rows = rows
+        self.attributes = attributes
+
+    def get_chunks(self):
+        "Generate the serialized table."
+        head, tail = str(TABLE(self.header, MARKER % 'rows',
+                               **self.attributes)).split(MARKER % 'rows')
+        yield head
+        for row in self.rows:
+            yield str(row)
+        yield tail
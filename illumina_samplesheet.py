@@ -31,26 +31,36 @@ in CSV format which is attached to the task. The following must hold:
         "Must return the filename of the module."
         return 'illumina_samplesheet'
 
+    def get_dependencies(self, doc):
+        """Return the task, and its protocol and instrument, if any.
+        A placeholder is given for a referenced document not found."""
+        result = [doc]
+        for entity in ('protocol', 'instrument'):
+            name = doc.get(entity)
+            if not name: continue
+            try:
+                result.append(self.dispatcher.get_named_document(entity, name))
+            except ValueError:
+                result.append(dict(entity=entity, name=name))
+        return result
+
     def is_enabled(self, doc):
-        "Does the entity document satisfy all conditions for this tool?"
+        """Does the entity document satisfy all conditions for this tool?
+        Decided from the documents and attachment stubs only."""
         if doc.get('entity') != 'task': return False
 
         # Workset defined
-        workset = doc.get('workset')
-        if not workset: return False
-        self.workset = self.dispatcher.get_named_document('workset', workset)
+        if not doc.get('workset'): return False
 
         # Protocol defined, and Illumina index file attached to it
         protocol = doc.get('protocol')
         if not protocol: return False
         try:
-            self.protocol = self.dispatcher.get_named_document('protocol',
-                                                               protocol)
+            protocol = self.dispatcher.get_named_document('protocol', protocol)
         except ValueError:
             return False
-        self.indexfile = self.dispatcher.db.get_attachment(
-                             self.protocol, 'illumina_indexes.csv')
-        if not self.indexfile: return False
+        if 'illumina_indexes.csv' not in protocol.get('_attachments', dict()):
+            return False
 
         # Instrument type 'Illumina HiSeq'
         instrument = doc.get('instrument')
@@ -67,6 +77,8 @@ in CSV format which is attached to the task. The following must hold:
     def get_view(self, dispatcher):
         "Produce the HTML containing all input elements for the operation."
         doc = dispatcher.doc
+        self.protocol = self.dispatcher.get_named_document('protocol',
+                                                           doc['protocol'])
         divs = [TABLE(
             TR(TH('Task'),
                TD(A(doc['name'], href=configuration.get_entity_url(doc)))),
@@ -99,6 +111,16 @@ in CSV format which is attached to the task. The following must hold:
         operator = self.dispatcher.get_named_document('account',doc['operator'])
         operator = operator.get('initials') or operator['name']
 
+        # Load the full data only now that the tool is run
+        self.workset = self.dispatcher.get_named_document('workset',
+                                                          doc['workset'])
+        protocol = self.dispatcher.get_named_document('protocol',
+                                                      doc['protocol'])
+        self.indexfile = self.dispatcher.db.get_attachment(
+                             protocol, 'illumina_indexes.csv')
+        if not self.indexfile:
+            raise ValueError("protocol has no 'illumina_indexes.csv'")
+
         # Get the arrangement of samples from the workset
         grid = self.workset.get('grid')
         arrangement = grid.get('arrangement')
@@ -116,6 +138,10 @@ in CSV format which is attached to the task. The following must hold:
         for row in csv.reader(self.indexfile.read().strip().split('\n')):
             index_lookup[row[0]] = row[1]
 
+        # Fetch all samples in the arrangement at once
+        samples = [s for s in utils.flatten(arrangement) if s]
+        self.dispatcher.get_named_documents('sample', samples)
+
         # Set sequence from index name, if required
         # Check for sequence collisions
         # There is only one row for Illumina run; one flowcell!
@@ -146,10 +172,12 @@ in CSV format which is attached to the task. The following must hold:
                         if sequence in sequences: raise ValueError
                         sequences.add(sequence)
                         doc['multiplex_sequence'] = sequence
-                        self.db.save(doc)
-                        self.log(doc.id, 'modified multiplex_sequence',
-                                 initial=initial,
-                                 comment='while creating Illumina sample sheet')
+                        self.dispatcher.save(doc)
+                        self.dispatcher.log(doc.id,
+                                            'modified multiplex_sequence',
+                                            initial=initial,
+                                            comment='while creating Illumina'
+                                            ' sample sheet')
                 except ValueError:
                     raise ValueError("multiplex_sequence='%s' for"
                                      " sample '%s' already in use"
@@ -117,15 +117,19 @@ class Instruments(Dispatcher):
                    TH('Label'),
                    TH('Type'),
                    TH('Timestamp'))]
-        view = self.db.view('instrument/name', include_docs=True)
-        for result in view:
-            doc = result.doc
-            instrument = A(doc['name'],
-                           href=configuration.get_url('instrument',doc['name']))
+        results, navigation = self.get_page(request,
+                                            'instrument/list',
+                                            'instruments')
+        for result in results:
+            summary = result.value
+            instrument = A(result.key,
+                           href=configuration.get_url('instrument',result.key))
             rows.append(TR(TD(instrument),
-                           TD(doc['label'] or ''),
-                           TD(doc['type']),
-                           TD(doc['timestamp'])))
+                           TD(summary['label'] or ''),
+                           TD(summary['type'] or ''),
+                           TD(summary['timestamp'] or '')))
         page.append(TABLE(border=1, *rows))
+        if navigation:
+            page.append(navigation)
 
         page.write(response)
@@ -2,41 +2,171 @@
 
 Load or update the design documents into the database.
 
+If DESIGN_GROUPS is set in the site module, then the views are merged
+into the design documents given by it; see module 'design'.
+
+Design documents whose views have not changed are not uploaded.
+In staged mode, each changed design document is first uploaded under
+a staging id, and its indexes are built in the background while the
+progress is shown. Only then are the views put into the live design
+document. CouchDB shares the index files between design documents with
+identical views, so the live views are usable at once after the swap.
+
+When all directories are loaded, the design documents which are no
+longer generated are then deleted; for instance the per-directory
+design documents after DESIGN_GROUPS has been set. Otherwise CouchDB
+would keep updating their indexes on every write.
+
 Per Kraulis
 2011-02-13
 """
 
-import os, sys
+import os, time, threading, optparse
 
+from slog import design
 from slog.load import get_db, put_document
 
+STAGING_SUFFIX = '_staging'
 
-def load_designs(root='designs', dirs=[]):
-    db = get_db()
+
+def get_views(root, directory):
+    "Return the views dictionary for the given design directory."
+    views = dict()
+    path = os.path.join(root, directory, 'views')
+    for filename in os.listdir(path):
+        name, ext = os.path.splitext(filename)
+        if ext != '.js': continue
+        with open(os.path.join(path, filename)) as codefile:
+            code = codefile.read()
+        if name.startswith('map_'):
+            name = name[len('map_'):]
+            key = 'map'
+        elif name.startswith('reduce_'):
+            name = name[len('reduce_'):]
+            key = 'reduce'
+        else:
+            key = 'map'
+        views.setdefault(name, dict())[key] = code
+    return views
+
+def get_design_documents(root='designs', dirs=[], groups=None):
+    """Return the design documents for the given directories.
+    If groups are given, then return the merged design documents
+    containing the directories."""
     if not dirs:
-        dirs = os.listdir(root)
-    for design in dirs:
+        dirs = sorted(os.listdir(root))
+    dirs = [d for d in dirs if os.path.isdir(os.path.join(root, d))]
+    if not groups:
+        return [dict(_id="_design/%s" % d, views=get_views(root, d))
+                for d in dirs]
+    result = []
+    for group in sorted(set([design.get_group(d, groups) for d in dirs])):
         views = dict()
-        doc = dict(_id="_design/%s" % design, views=views)
-        path = os.path.join(root, design)
-        if not os.path.isdir(path): continue
-        path = os.path.join(root, design, 'views')
-        for filename in os.listdir(path):
-            name, ext = os.path.splitext(filename)
-            if ext != '.js': continue
-            with open(os.path.join(path, filename)) as codefile:
-                code = codefile.read()
-            if name.startswith('map_'):
-                name = name[len('map_'):]
-                key = 'map'
-            elif name.startswith('reduce_'):
-                name = name[len('reduce_'):]
-                key = 'reduce'
-            else:
-                key = 'map'
-            views.setdefault(name, dict())[key] = code
-        put_document(doc)
+        for directory in groups[group]:
+            for name, view in get_views(root, directory).items():
+                views["%s_%s" % (directory, name)] = view
+        result.append(dict(_id="_design/%s" % group, views=views))
+    return result
+
+def get_changed_documents(db, docs):
+    "Return the design documents whose views differ from those in the db."
+    result = []
+    for doc in docs:
+        current = db.get(doc['_id'])
+        if current is None or current.get('views') != doc['views']:
+            result.append(doc)
+    return result
+
+def get_index_progress(db, id):
+    "Return the fraction of the database indexed for the design document."
+    status, headers, data = db.resource.get_json(*(id.split('/') + ['_info']))
+    update_seq = db.info()['update_seq']
+    if not update_seq: return 1.0
+    return min(1.0, float(data['view_index']['update_seq']) / update_seq)
+
+def build_indexes(db, id, interval=5.0):
+    """Build the indexes of the design document by querying one of its
+    views in a background thread. Show the progress until done."""
+    doc = db[id]
+    view = "%s/_view/%s" % (id, sorted(doc['views'])[0])
+    errors = []
+    def query():
+        try:
+            len(db.view(view, limit=0))
+        except Exception, msg:
+            errors.append(msg)
+    thread = threading.Thread(target=query)
+    thread.daemon = True
+    started = time.time()
+    thread.start()
+    while thread.is_alive():
+        thread.join(interval)
+        try:
+            progress = get_index_progress(db, id)
+        except Exception:
+            continue
+        print "%s: %3i%% indexed, %.0f s" % (id, 100.0 * progress,
+                                            time.time() - started)
+    if errors:
+        raise IOError("building indexes for %s failed: %s" % (id, errors[0]))
+
+def deploy_staged(db, doc, interval=5.0):
+    """Upload the design document under the staging id, build its indexes,
+    then put the views into the live design document."""
+    staging_id = doc['_id'] + STAGING_SUFFIX
+    staged = db.get(staging_id) or dict(_id=staging_id)
+    staged['views'] = doc['views']
+    db.save(staged)
+    build_indexes(db, staging_id, interval=interval)
+    live = db.get(doc['_id']) or dict(_id=doc['_id'])
+    live['views'] = doc['views']
+    db.save(live)
+    db.delete(db[staging_id])
+    print "%s: deployed" % doc['_id']
+
+def get_obsolete_documents(db, docs, root='designs', groups=None):
+    """Return the design documents in the db which are not among those
+    given, but which would be generated with or without grouping, or are
+    left over from staging. Other design documents are left alone."""
+    names = [d for d in os.listdir(root)
+             if os.path.isdir(os.path.join(root, d))]
+    names.extend((groups or dict()).keys())
+    ids = set(["_design/%s" % n for n in names])
+    ids.update([id + STAGING_SUFFIX for id in ids])
+    ids.difference_update([doc['_id'] for doc in docs])
+    return [doc for doc in [db.get(id) for id in sorted(ids)]
+            if doc is not None]
+
+def load_designs(root='designs', dirs=[], groups=None, staged=False,
+                 interval=5.0):
+    """Upload the changed design documents, possibly in staged mode.
+    If all directories are loaded, then delete the obsolete ones."""
+    if groups is None:
+        groups = design.get_groups()
+    db = get_db()
+    docs = get_design_documents(root=root, dirs=dirs, groups=groups)
+    for doc in get_changed_documents(db, docs):
+        if staged:
+            deploy_staged(db, doc, interval=interval)
+        else:
+            put_document(doc)
+            print "%s: loaded" % doc['_id']
+    if dirs: return
+    for doc in get_obsolete_documents(db, docs, root=root, groups=groups):
+        db.delete(doc)
+        print "%s: deleted" % doc['_id']
 
 
 if __name__ == '__main__':
-    load_designs(dirs=sys.argv[1:])
+    parser = optparse.OptionParser(
+        usage='python load_designs.py [options] [directory...]',
+        description='Load the changed design documents. If no directory'
+        ' is given, then all are loaded, and the design documents no longer'
+        ' generated, such as the per-directory ones when DESIGN_GROUPS is'
+        ' set, are deleted after the new ones are in place.')
+    parser.add_option('-s', '--staged', action='store_true', default=False,
+                      help='build the indexes before replacing live designs')
+    parser.add_option('-i', '--interval', type='float', default=5.0,
+                      help='seconds between progress reports')
+    options, args = parser.parse_args()
+    load_designs(dirs=args, staged=options.staged, interval=options.interval)
@@ -0,0 +1,407 @@
+""" slog: Simple sample tracker system.
+
+In-memory stand-in for a CouchDB database, implementing the subset of
+the couchdb-python API used by slog. The views are computed using the
+Python ports in 'views'. As in CouchDB, the sorted index of a view is
+built when queried, and kept until the database is changed; queries
+locate their rows in it by bisection. For tests and benchmarks only.
+
+Per Kraulis
+2011-04-06
+"""
+
+import json, copy, bisect, base64, uuid, cStringIO
+
+import couchdb
+
+from .utils import collation_key
+from .views import VIEWS
+
+
+NOT_GIVEN = object()                    # Marker for absent 'key' option
+
+
+class Document(dict):
+    "Document as returned by the database."
+
+    @property
+    def id(self):
+        return self['_id']
+
+    @property
+    def rev(self):
+        return self['_rev']
+
+
+class Row(dict):
+    "Row in view results."
+
+    @property
+    def id(self):
+        return self.get('id')
+
+    @property
+    def key(self):
+        return self.get('key')
+
+    @property
+    def value(self):
+        return self.get('value')
+
+    @property
+    def doc(self):
+        doc = self.get('doc')
+        if doc is not None:
+            return Document(doc)
+
+
+class ViewResults(object):
+    "Lazily computed results of a view query."
+
+    def __init__(self, db, name, options):
+        self.db = db
+        self.name = name
+        self.options = options
+        self._rows = None
+
+    def __getitem__(self, key):
+        options = self.options.copy()
+        if isinstance(key, slice):
+            if key.start is not None:
+                options['startkey'] = key.start
+            if key.stop is not None:
+                options['endkey'] = key.stop
+        else:
+            options['key'] = key
+        return ViewResults(self.db, self.name, options)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows, self.total_rows, self.offset = \
+                self.db.query(self.name, **self.options)
+        return self._rows
+
+
+class Index(object):
+    "Sorted rows (key, id, value) of a view, for a database update sequence."
+
+    def __init__(self, seq, rows):
+        self.seq = seq
+        self.rows = rows
+        self.keys = [collation_key(r[0]) for r in rows]
+        self.entries = zip(self.keys, [r[1] for r in rows])
+
+    def get_bound(self, key, docid, after, default):
+        """Return the position of the first row at or 'after' the key,
+        and document id if given, or the default if no key."""
+        if key is None:
+            return default
+        if docid is None:
+            values, value = self.keys, collation_key(key)
+        else:
+            values, value = self.entries, (collation_key(key), docid)
+        if after:
+            return bisect.bisect_right(values, value)
+        else:
+            return bisect.bisect_left(values, value)
+
+    def get_key_bounds(self, key):
+        "Return the positions of the first row of the key, and after it."
+        value = collation_key(key)
+        return (bisect.bisect_left(self.keys, value),
+                bisect.bisect_right(self.keys, value))
+
+    def get_range(self, lower, upper, descending=False):
+        "Return the rows in the range of positions, in the given order."
+        rows = self.rows[lower:max(lower, upper)]
+        if descending:
+            rows.reverse()
+        return rows
+
+
+class Database(object):
+    """In-memory database. The documents are stored as JSON-compatible
+    deep copies, so that modifying a returned document does not affect
+    the stored one."""
+
+    def __init__(self, name='slog', views=VIEWS):
+        self.name = name
+        self.views = views
+        self.docs = dict()              # Key: id, value: stored document
+        self.attachments = dict()       # Key: (id, filename), value: content
+        self.update_seq = 0
+        self.deleted = dict()           # Key: id, value: rev when deleted
+        self.seqs = dict()              # Key: id, value: seq of last change
+        self.indexes = dict()           # Key: view name, value: Index
+
+    def __contains__(self, id):
+        return id in self.docs
+
+    def __iter__(self):
+        return iter(sorted(self.docs))
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __getitem__(self, id):
+        try:
+            return Document(copy.deepcopy(self.docs[id]))
+        except KeyError:
+            raise couchdb.ResourceNotFound(('not_found', 'missing'))
+
+    def get(self, id, default=None):
+        try:
+            return self[id]
+        except couchdb.ResourceNotFound:
+            return default
+
+    def info(self):
+        return dict(db_name=self.name,
+                    doc_count=len(self.docs),
+                    update_seq=self.update_seq)
+
+    def new_revision(self, id):
+        "Return the next revision for the document."
+        try:
+            count = int(self.docs[id]['_rev'].split('-', 1)[0])
+        except KeyError:
+            count = 0
+        return "%i-%s" % (count + 1, uuid.uuid4().hex)
+
+    def check_revision(self, doc):
+        "Raise ResourceConflict if the revision of the document is not current."
+        current = self.docs.get(doc['_id'])
+        if current is None:
+            if doc.get('_rev'):
+                raise couchdb.ResourceConflict(('conflict', 'no such document'))
+        elif doc.get('_rev') != current['_rev']:
+            raise couchdb.ResourceConflict(('conflict', 'update conflict'))
+
+    def store(self, doc):
+        "Store a copy of the document as a new revision. Return the revision."
+        id = doc['_id']
+        rev = self.new_revision(id)
+        stored = json.loads(json.dumps(doc))
+        stored['_rev'] = rev
+        stubs = dict()
+        for filename, stub in (stored.get('_attachments') or dict()).items():
+            if 'data' in stub:          # Inline attachment
+                content = base64.b64decode(stub['data'])
+                self.attachments[(id, filename)] = content
+                stub = dict(content_type=stub.get('content_type'),
+                            length=len(content))
+            elif (id, filename) not in self.attachments:
+                continue
+            stub['stub'] = True
+            stubs[filename] = stub
+        for key in self.attachments.keys():
+            if key[0] == id and key[1] not in stubs:
+                del self.attachments[key]
+        if stubs:
+            stored['_attachments'] = stubs
+        else:
+            stored.pop('_attachments', None)
+        self.docs[id] = stored
+        self.deleted.pop(id, None)
+        self.update_seq += 1
+        self.seqs[id] = self.update_seq
+        return rev
+
+    def save(self, doc, **options):
+        "Create or update the document. Return the tuple (id, rev)."
+        doc.setdefault('_id', uuid.uuid4().hex)
+        self.check_revision(doc)
+        doc['_rev'] = self.store(doc)
+        return doc['_id'], doc['_rev']
+
+    def update(self, documents, **options):
+        """Save the documents in bulk. Return the list of tuples
+        (success, id, rev or exception) as couchdb-python does."""
+        result = []
+        for doc in documents:
+            try:
+                id, rev = self.save(doc)
+            except couchdb.ResourceConflict, msg:
+                result.append((False, doc.get('_id'), msg))
+            else:
+                result.append((True, id, rev))
+        return result
+
+    def delete(self, doc):
+        self.check_revision(doc)
+        del self.docs[doc['_id']]
+        for key in self.attachments.keys():
+            if key[0] == doc['_id']:
+                del self.attachments[key]
+        self.deleted[doc['_id']] = self.new_revision(doc['_id'])
+        self.update_seq += 1
+        self.seqs[doc['_id']] = self.update_seq
+
+    def changes(self, since=0, include_docs=False, limit=None, **options):
+        """Return the changes feed since the given sequence number:
+        a dictionary with 'results' and 'last_seq'."""
+        results = []
+        for id, seq in sorted(self.seqs.items(), key=lambda i: i[1]):
+            if seq <= since: continue
+            change = dict(seq=seq, id=id)
+            if id in self.deleted:
+                change['deleted'] = True
+                change['changes'] = [dict(rev=self.deleted[id])]
+            else:
+                change['changes'] = [dict(rev=self.docs[id]['_rev'])]
+                if include_docs:
+                    change['doc'] = copy.deepcopy(self.docs[id])
+            results.append(change)
+            if limit is not None and len(results) >= limit: break
+        if results:
+            last_seq = results[-1]['seq']
+        else:
+            last_seq = max(since, self.update_seq)
+        return dict(results=results, last_seq=last_seq)
+
+    def get_attachment(self, id_or_doc, filename, default=None):
+        "Return a file-like object for the attachment content."
+        if isinstance(id_or_doc, basestring):
+            id = id_or_doc
+        else:
+            id = id_or_doc['_id']
+        try:
+            return cStringIO.StringIO(self.attachments[(id, filename)])
+        except KeyError:
+            return default
+
+    def put_attachment(self, doc, content, filename=None, content_type=None):
+        "Add or replace the attachment, updating the revision of the document."
+        if filename is None:
+            filename = content.name
+        if hasattr(content, 'read'):
+            content = content.read()
+        stored = self[doc['_id']]
+        self.check_revision(doc)
+        self.attachments[(doc['_id'], filename)] = content
+        stubs = stored.setdefault('_attachments', dict())
+        stubs[filename] = dict(content_type=content_type or
+                               'application/octet-stream',
+                               length=len(content))
+        doc['_rev'] = self.store(stored)
+
+    def delete_attachment(self, doc, filename):
+        "Delete the attachment, updating the revision of the document."
+        stored = self[doc['_id']]
+        self.check_revision(doc)
+        stored.get('_attachments', dict()).pop(filename, None)
+        doc['_rev'] = self.store(stored)
+
+    def view(self, name, **options):
+        "Return the lazily computed results of the view."
+        return ViewResults(self, name, options)
+
+    def get_index(self, name):
+        """Return the index of the view, computing it only if the
+        database has changed since it was last computed."""
+        index = self.indexes.get(name)
+        if index is None or index.seq != self.update_seq:
+            index = Index(self.update_seq, self.get_rows(name))
+            self.indexes[name] = index
+        return index
+
+    def get_rows(self, name):
+        "Compute the sorted rows (key, id, value) of the view."
+        if name == '_all_docs':
+            rows = [(id, id, dict(rev=doc['_rev']))
+                    for id, doc in self.docs.items()]
+            rows.sort()
+            return rows
+        try:
+            map, reduce = self.views[name]
+        except KeyError:
+            raise couchdb.ResourceNotFound(('not_found', 'missing_named_view'))
+        rows = []
+        for id, doc in self.docs.items():
+            for key, value in map(doc):
+                rows.append((key, id, value))
+        rows.sort(key=lambda r: (collation_key(r[0]), r[1]))
+        return rows
+
+    def query(self, name, key=NOT_GIVEN, keys=None,
+              startkey=None, endkey=None,
+              startkey_docid=None, endkey_docid=None, inclusive_end=True,
+              descending=False, include_docs=False, group=False,
+              group_level=None, reduce=True, skip=0, limit=None, **options):
+        """Compute the rows of the view for the given query options.
+        Return the tuple (rows, total_rows, offset)."""
+        index = self.get_index(name)
+        total_rows = len(index.rows)
+        offset = 0
+        if keys is not None:
+            rows = []
+            for k in keys:
+                rows.extend(index.get_range(*index.get_key_bounds(k),
+                                            descending=descending))
+        elif key is not NOT_GIVEN:
+            rows = index.get_range(*index.get_key_bounds(key),
+                                   descending=descending)
+        else:
+            if descending:
+                lower = index.get_bound(endkey, endkey_docid,
+                                        after=not inclusive_end, default=0)
+                upper = index.get_bound(startkey, startkey_docid,
+                                        after=True, default=total_rows)
+                offset = total_rows - upper
+            else:
+                lower = index.get_bound(startkey, startkey_docid,
+                                        after=False, default=0)
+                upper = index.get_bound(endkey, endkey_docid,
+                                        after=inclusive_end,
+                                        default=total_rows)
+                offset = lower
+            rows = index.get_range(lower, upper, descending=descending)
+        view_reduce = name != '_all_docs' and self.views[name][1]
+        if view_reduce and reduce:
+            rows = self.reduce(rows, view_reduce, group, group_level)
+            rows = rows[skip:]
+            if limit is not None:
+                rows = rows[:limit]
+        else:
+            rows = rows[skip:]
+            if limit is not None:
+                rows = rows[:limit]
+            # Copies, so that the index is not changed via the results
+            rows = [Row(id=id, key=copy.deepcopy(k), value=copy.deepcopy(v))
+                    for k, id, v in rows]
+            if include_docs:
+                for row in rows:
+                    row['doc'] = copy.deepcopy(self.docs[row['id']])
+        return rows, total_rows, offset
+
+    def reduce(self, rows, reduce, group=False, group_level=None):
+        "Apply the builtin reduce function to the rows."
+        if reduce == '_count':
+            function = len
+        elif reduce == '_sum':
+            function = lambda values: sum(values)
+        else:
+            raise NotImplementedError("reduce function '%s'" % reduce)
+        if group_level is not None:
+            get_group = lambda key: isinstance(key, list) and \
+                        key[:group_level] or key
+        elif group:
+            get_group = lambda key: key
+        else:
+            get_group = lambda key: None
+        result = []
+        for key, id, value in rows:
+            key = get_group(key)
+            if result and collation_key(result[-1][0]) == collation_key(key):
+                result[-1][1].append(value)
+            else:
+                result.append((key, [value]))
+        return [Row(key=key, value=function(values))
+                for key, values in result]
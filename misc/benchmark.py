@@ -0,0 +1,216 @@
+""" slog: Simple sample tracker system.
+
+Page-latency benchmark: drive the WSGI application in-process against
+all routes, using an in-memory database containing a synthetic lab.
+For each route, report p50/p95 latency, p50 time to first byte, p50 CPU
+time, database calls, bytes transferred from the database and response
+bytes, and finally the peak RSS.
+The result may be saved as a baseline, and compared with a previously
+saved baseline.
+
+Usage: python misc/benchmark.py [options]
+
+Per Kraulis
+2011-04-07
+"""
+
+import sys, time, json, base64, cStringIO, urllib, optparse, resource
+
+from slog import configuration, memdb
+from slog.dbstats import InstrumentedDatabase
+
+from synthetic_lab import make_lab, PASSWORD
+
+
+class Client(object):
+    "Call the WSGI application in-process."
+
+    def __init__(self, application, user='system', password=PASSWORD):
+        self.application = application
+        credentials = base64.b64encode("%s:%s" % (user, password))
+        self.authorization = "Basic %s" % credentials
+
+    def request(self, method, path, fields=None):
+        """Return the tuple (status, response body, seconds until the
+        first non-empty body chunk)."""
+        if fields:
+            query = urllib.urlencode(fields)
+        else:
+            query = ''
+        environ = {'REQUEST_METHOD': method,
+                   'SCRIPT_NAME': configuration.site.PATH,
+                   'PATH_INFO': path,
+                   'QUERY_STRING': '',
+                   'SERVER_NAME': 'localhost',
+                   'SERVER_PORT': '80',
+                   'SERVER_PROTOCOL': 'HTTP/1.1',
+                   'HTTP_HOST': 'localhost',
+                   'HTTP_AUTHORIZATION': self.authorization,
+                   'HTTP_USER_AGENT': 'Mozilla/5.0 Firefox/3.6 benchmark',
+                   'wsgi.version': (1, 0),
+                   'wsgi.url_scheme': 'http',
+                   'wsgi.errors': sys.stderr,
+                   'wsgi.multithread': False,
+                   'wsgi.multiprocess': False,
+                   'wsgi.run_once': False}
+        if method == 'POST':
+            environ['CONTENT_TYPE'] = 'application/x-www-form-urlencoded'
+            environ['CONTENT_LENGTH'] = str(len(query))
+            environ['wsgi.input'] = cStringIO.StringIO(query)
+        else:
+            environ['QUERY_STRING'] = query
+            environ['wsgi.input'] = cStringIO.StringIO('')
+        status = []
+        def start_response(value, headers, exc_info=None):
+            status.append(value)
+        started = time.time()
+        first = None
+        chunks = []
+        for chunk in self.application(environ, start_response):
+            if first is None and chunk:
+                first = time.time() - started
+            chunks.append(chunk)
+        return status[0], ''.join(chunks), first or time.time() - started
+
+
+def get_routes(lab):
+    "Return the list of (label, method, path, fields) for all routes."
+    project = lab.projects[len(lab.projects) / 2]
+    sample = lab.samples[len(lab.samples) / 2]
+    workset = lab.worksets[len(lab.worksets) / 2]
+    task = lab.tasks[len(lab.tasks) / 2]
+    account = lab.accounts[-1]['name']
+    protocol = lab.protocols[0]['name']
+    instrument = lab.instruments[0]['name']
+    routes = [('Home', 'GET', '/', None),
+              ('Search', 'GET', '/search', dict(key=sample[:-2])),
+              ('Accounts', 'GET', '/accounts', None),
+              ('Projects', 'GET', '/projects', None),
+              ('Samples', 'GET', '/samples', dict(operator='all')),
+              ('Worksets', 'GET', '/worksets', dict(operator='all')),
+              ('Protocols', 'GET', '/protocols', None),
+              ('Tasks', 'GET', '/tasks', dict(operator='all')),
+              ('Instruments', 'GET', '/instruments', None)]
+    for entity, name, field in [('account', account, 'fullname'),
+                                ('project', project, 'operator'),
+                                ('sample', sample, 'parent'),
+                                ('workset', workset, 'samples'),
+                                ('protocol', protocol, 'description'),
+                                ('task', task, 'instrument'),
+                                ('instrument', instrument, 'operator')]:
+        path = "/%s/%s" % (entity, name)
+        routes.append(("%s view" % entity, 'GET', path, None))
+        routes.append(("%s edit %s" % (entity, field), 'GET', path,
+                       dict(edit=field)))
+        routes.append(("%s edit tags" % entity, 'GET', path,
+                       dict(edit='_tags')))
+    routes.append(('sample POST tags', 'POST', "/sample/%s" % sample,
+                   dict(_tags_add='benchmark')))
+    routes.append(('workset POST description', 'POST', "/workset/%s" % workset,
+                   dict(description='Modified by benchmark.')))
+    routes.append(('workset POST combined', 'POST', "/workset/%s" % workset,
+                   dict(description='Modified again by benchmark.',
+                        _tags_add='benchmark',
+                        _xref_add_uri='http://localhost/benchmark')))
+    routes.append(('project create', 'GET', '/project', None))
+    routes.append(('names lookup', 'GET', '/names/sample',
+                   dict(prefix=sample[:4])))
+    return routes
+
+def percentile(values, fraction):
+    "Return the given percentile of the values."
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run(scale='small', repeat=10, **sizes):
+    """Create the synthetic lab, and run the benchmark for all routes.
+    Return a dictionary with the results for each route label."""
+    # The benchmark instruments the database itself, for all requests
+    configuration.site.DATABASE_INSTRUMENTATION = False
+    db = InstrumentedDatabase(memdb.Database())
+    lab = make_lab(db.db, scale=scale, **sizes)
+    configuration.set_db(db)
+    from slog.wsgi_application import application
+    client = Client(application)
+    results = dict()
+    for label, method, path, fields in get_routes(lab):
+        times = []
+        firsts = []
+        cpus = []
+        calls = []
+        transferred = []
+        for i in xrange(repeat):
+            count = len(db.calls)
+            started = time.time()
+            cpu = time.clock()
+            status, body, first = client.request(method, path, fields)
+            firsts.append(first)
+            cpus.append(time.clock() - cpu)
+            times.append(time.time() - started)
+            calls.append(len(db.calls) - count)
+            transferred.append(sum([c['bytes'] for c in db.calls[count:]]))
+        results[label] = dict(status=status,
+                              p50=percentile(times, 0.50),
+                              p95=percentile(times, 0.95),
+                              ttfb=percentile(firsts, 0.50),
+                              cpu=percentile(cpus, 0.50),
+                              calls=percentile(calls, 0.50),
+                              dbbytes=percentile(transferred, 0.50),
+                              bytes=len(body))
+    return results
+
+def report(results, baseline=None):
+    "Print the results, compared with the baseline, if any."
+    print "%-28s %8s %8s %8s %8s %6s %9s %9s  %s" % ('Route', 'p50 ms',
+                                                     'p95 ms', 'ttfb ms',
+                                                     'cpu ms', 'calls',
+                                                     'db bytes', 'bytes',
+                                                     'status')
+    for label in sorted(results):
+        result = results[label]
+        line = "%-28s %8.1f %8.1f %8.1f %8.1f %6i %9i %9i  %s" % \
+               (label,
+                1000.0 * result['p50'],
+                1000.0 * result['p95'],
+                1000.0 * result.get('ttfb', 0.0),
+                1000.0 * result.get('cpu', 0.0),
+                result['calls'],
+                result.get('dbbytes', 0),
+                result['bytes'],
+                result['status'])
+        try:
+            base = baseline[label]
+        except (TypeError, KeyError):
+            pass
+        else:
+            line += "  [p50 x%.2f, cpu x%.2f, calls %+i, db bytes x%.2f]" % \
+                    (result['p50'] / max(base['p50'], 1e-6),
+                     result['cpu'] / max(base.get('cpu', 0.0), 1e-6),
+                     result['calls'] - base['calls'],
+                     float(result.get('dbbytes', 0)) /
+                     max(base.get('dbbytes', 0), 1))
+        print line
+    # Linux reports kilobytes
+    print "Peak RSS %.1f MB" % \
+          (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage='python misc/benchmark.py [options]')
+    parser.add_option('-s', '--scale', default='small',
+                      help='scale of synthetic lab: small, medium or large')
+    parser.add_option('-r', '--repeat', type='int', default=10,
+                      help='number of requests per route')
+    parser.add_option('-b', '--baseline',
+                      help='JSON file of baseline results to compare with')
+    parser.add_option('-o', '--output',
+                      help='JSON file to save the results in, as new baseline')
+    options, args = parser.parse_args()
+    results = run(scale=options.scale, repeat=options.repeat)
+    if options.baseline:
+        baseline = json.load(open(options.baseline))
+    else:
+        baseline = None
+    report(results, baseline=baseline)
+    if options.output:
+        json.dump(results, open(options.output, 'w'), indent=2)
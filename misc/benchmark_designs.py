@@ -0,0 +1,79 @@
+""" slog: Simple sample tracker system.
+
+Benchmark of the index update cost for separate versus merged design
+documents. Requires the CouchDB server of the site configuration;
+scratch databases are created and deleted.
+
+Usage: python misc/benchmark_designs.py [scale]
+
+Per Kraulis
+2011-04-09
+"""
+
+import os, sys, time
+
+import couchdb
+
+from slog import configuration
+from slog.load_designs import get_design_documents
+
+from synthetic_lab import make_lab
+
+
+class Collector(object):
+    "Collect the documents produced by the synthetic lab."
+
+    def __init__(self):
+        self.docs = []
+
+    def save(self, doc):
+        self.docs.append(doc)
+        return doc['_id'], None
+
+
+def get_server():
+    site = configuration.site
+    server = couchdb.Server(site.COUCHDB_SERVER)
+    if site.COUCHDB_USER and site.COUCHDB_PASSWORD:
+        server.resource.http.add_credentials(site.COUCHDB_USER,
+                                             site.COUCHDB_PASSWORD)
+    return server
+
+def time_index_update(server, name, designs, docs, chunk=1000):
+    """Create the scratch database with the design documents, load the
+    documents, and return the time to bring all indexes up to date."""
+    if name in server:
+        del server[name]
+    db = server.create(name)
+    try:
+        for design in designs:
+            db.save(design)
+        for pos in xrange(0, len(docs), chunk):
+            db.update(docs[pos:pos+chunk])
+        started = time.time()
+        for design in designs:
+            view = sorted(design['views'])[0]
+            design_name = design['_id'][len('_design/'):]
+            len(db.view("%s/%s" % (design_name, view), limit=0))
+        return time.time() - started
+    finally:
+        del server[name]
+
+def run(scale='small', root='designs'):
+    collector = Collector()
+    make_lab(collector, scale=scale)
+    dirs = [d for d in sorted(os.listdir(root))
+            if os.path.isdir(os.path.join(root, d))]
+    server = get_server()
+    separate = get_design_documents(root=root)
+    merged = get_design_documents(root=root, groups=dict(slog=dirs))
+    for label, designs in [('separate', separate), ('merged', merged)]:
+        docs = [dict(d) for d in collector.docs]
+        seconds = time_index_update(server, "slog_bench_%s" % label,
+                                    designs, docs)
+        print "%-8s %2i design docs, %7i docs: index update %.1f s" % \
+              (label, len(designs), len(docs), seconds)
+
+
+if __name__ == '__main__':
+    run(scale=len(sys.argv) > 1 and sys.argv[1] or 'small')
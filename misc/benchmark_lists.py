@@ -0,0 +1,71 @@
+""" slog: Simple sample tracker system.
+
+Benchmark of the view queries for one page of each entity list: the
+name view with 'include_docs', as the list pages used to do, versus
+the list-summary view emitting only the columns shown. Reports the
+time and the bytes transferred per query, using an in-memory database
+containing a synthetic lab.
+
+Usage: python misc/benchmark_lists.py [scale]
+
+Per Kraulis
+2011-04-13
+"""
+
+import sys, time
+
+from slog import configuration, memdb
+from slog.dbstats import InstrumentedDatabase
+
+from synthetic_lab import make_lab
+
+
+# Key: list, value: (view with include_docs, list-summary view, options)
+QUERIES = [('Accounts', 'account/name', 'account/list', dict()),
+           ('Instruments', 'instrument/name', 'instrument/list', dict()),
+           ('Projects', 'project/name', 'project/list',
+            dict(descending=True)),
+           ('Protocols', 'protocol/name', 'protocol/list', dict()),
+           ('Tasks', 'task/name', 'task/list', dict()),
+           ('Worksets', 'workset/name', 'workset/list', dict())]
+
+
+def time_query(db, name, repeat=10, **options):
+    """Run the view query, and return the tuple (median seconds,
+    bytes transferred)."""
+    times = []
+    for i in xrange(repeat):
+        started = time.time()
+        list(db.view(name, **options))
+        times.append(time.time() - started)
+    times.sort()
+    return times[len(times) / 2], db.calls[-1]['bytes']
+
+def run(scale='large'):
+    "Create the synthetic lab, and compare the queries for all lists."
+    db = InstrumentedDatabase(memdb.Database())
+    make_lab(db.db, scale=scale)
+    size = getattr(configuration.site, 'LIST_PAGE_SIZE', 100)
+    print "Page size %i rows" % size
+    print "%-12s %10s %10s %12s %12s" % ('List', 'docs ms', 'list ms',
+                                         'docs bytes', 'list bytes')
+    for label, docs_view, list_view, options in QUERIES:
+        docs_time, docs_bytes = time_query(db, docs_view,
+                                           include_docs=True,
+                                           limit=size + 1,
+                                           **options)
+        list_time, list_bytes = time_query(db, list_view,
+                                           limit=size + 1,
+                                           **options)
+        print "%-12s %10.1f %10.1f %12i %12i" % (label,
+                                                 1000.0 * docs_time,
+                                                 1000.0 * list_time,
+                                                 docs_bytes,
+                                                 list_bytes)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        run()
@@ -0,0 +1,147 @@
+""" slog: Simple sample tracker system.
+
+Benchmark of search: the previous fan-out over the name, tag, operator,
+customername and runname views of each entity, versus the single range
+query over the view 'all/search'. Reports the number of view queries,
+the rows and bytes transferred and the time per search, using an
+in-memory database containing a synthetic lab. Also checks that the
+index finds everything the fan-out found.
+
+The views used only by the fan-out are no longer deployed; they are
+defined here for the in-memory database only.
+
+Usage: python misc/benchmark_search.py [scale]
+
+Per Kraulis
+2011-04-13
+"""
+
+import sys, time
+
+from slog import memdb
+from slog.views import VIEWS
+from slog.dbstats import InstrumentedDatabase
+
+from synthetic_lab import make_lab
+
+
+ENTITIES = ['account', 'project', 'sample', 'workset',
+            'protocol', 'task', 'instrument']
+
+# There are no 'protocol/tag' or 'task/tag' views; the fan-out in
+# Search.GET queried them nonetheless.
+TAGGED_ENTITIES = ['account', 'project', 'sample', 'workset', 'instrument']
+
+OPERATOR_ENTITIES = ['project', 'workset', 'task', 'instrument']
+
+
+def get_field_view(entity, field):
+    """Return the map function of the former view indexing the documents
+    of the entity by the value of the field. Value: name."""
+    def map(doc):
+        if doc.get('entity') != entity: return
+        if not doc.get(field): return
+        yield doc[field], doc.get('name')
+    return map
+
+def get_tag_view(entity):
+    """Return the map function of the former view indexing the documents
+    of the entity by tag. Value: name."""
+    def map(doc):
+        if doc.get('entity') != entity: return
+        for tag in doc.get('tags') or []:
+            yield tag, doc.get('name')
+    return map
+
+def get_views():
+    "Return the deployed views, and the former ones used by the fan-out."
+    views = dict(VIEWS)
+    for entity in TAGGED_ENTITIES:
+        views["%s/tag" % entity] = (get_tag_view(entity), None)
+    for entity in OPERATOR_ENTITIES:
+        views["%s/operator" % entity] = (get_field_view(entity, 'operator'),
+                                         None)
+    views['sample/customername'] = (get_field_view('sample', 'customername'),
+                                    None)
+    views['task/runname'] = (get_field_view('task', 'runname'), None)
+    return views
+
+
+def fanout_search(db, key):
+    """Search as previously done by Search.GET: about twenty view
+    queries, case-sensitive prefix."""
+    result = set()
+    for entity in ENTITIES:
+        view = db.view("%s/name" % entity)
+        for row in view[key : "%sZZZZZZ" % key]:
+            result.add((entity, row.key))
+    for entity in TAGGED_ENTITIES:
+        view = db.view("%s/tag" % entity)
+        for row in view[key : "%sZZZZZZ" % key]:
+            result.add((entity, row.value))
+    for entity in OPERATOR_ENTITIES:
+        view = db.view("%s/operator" % entity)
+        for row in view[key : "%sZZZZZZ" % key]:
+            result.add((entity, row.value))
+    for row in db.view("sample/customername")[key : "%sZZZZZZ" % key]:
+        result.add(('sample', row.value))
+    for row in db.view("task/runname")[key : "%sZZZZZZ" % key]:
+        result.add(('task', row.value))
+    return result
+
+def index_search(db, key):
+    "Search as done by Search.GET: one range query."
+    prefix = unicode(key).lower()
+    view = db.view('all/search',
+                   startkey=prefix,
+                   endkey=prefix + u'\ufff0')
+    return set([(row.value[0], row.value[1]) for row in view])
+
+def measure(db, function, key, repeat=5):
+    """Return the tuple (result, median seconds, view queries, rows,
+    bytes) for the search function."""
+    times = []
+    for i in xrange(repeat):
+        count = len(db.calls)
+        started = time.time()
+        result = function(db, key)
+        times.append(time.time() - started)
+    calls = db.calls[count:]
+    times.sort()
+    return (result,
+            times[len(times) / 2],
+            len(calls),
+            sum([c['rows'] for c in calls]),
+            sum([c['bytes'] for c in calls]))
+
+def run(scale='small'):
+    "Create the synthetic lab, and compare the searches for some keys."
+    db = InstrumentedDatabase(memdb.Database(views=get_views()))
+    lab = make_lab(db.db, scale=scale)
+    keys = [lab.samples[len(lab.samples) / 2][:-2],
+            lab.projects[0][:3],
+            lab.accounts[-1]['name'],
+            'exome',
+            'zzz']
+    print "%-16s %8s %8s %6s %6s %6s %6s %8s %8s  %s" % \
+          ('Key', 'fan ms', 'idx ms', 'fan q', 'idx q', 'fan r', 'idx r',
+           'fan B', 'idx B', 'found')
+    for key in keys:
+        fanout = measure(db, fanout_search, key)
+        index = measure(db, index_search, key)
+        missing = fanout[0] - index[0]
+        print "%-16s %8.1f %8.1f %6i %6i %6i %6i %8i %8i  %i/%i%s" % \
+              (key,
+               1000.0 * fanout[1], 1000.0 * index[1],
+               fanout[2], index[2],
+               fanout[3], index[3],
+               fanout[4], index[4],
+               len(fanout[0]), len(index[0]),
+               missing and ' MISSING %s' % sorted(missing) or '')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        run()
@@ -0,0 +1,63 @@
+""" slog: Simple sample tracker system.
+
+Check the sequence numbering and checkpoints of the log entries, and
+the reconstruction of past revisions, using the in-memory database.
+
+Per Kraulis
+2011-04-15
+"""
+
+import sys, copy
+
+from slog import memdb, history
+
+
+def log_changes(db, count, interval, timestamp='2011-04-15T10:00:00Z'):
+    """Save the document 'count' times, logging each change as done by
+    Dispatcher.log, all with the same timestamp. Return the list of the
+    saved states."""
+    doc = dict(_id='d1', entity='sample', name='S1', amount=0)
+    initial = None
+    states = []
+    for i in xrange(count):
+        doc['amount'] = i
+        db.save(doc)
+        sequence, checkpoint = history.get_next_sequence(db, 'd1',
+                                                         initial=initial,
+                                                         interval=interval)
+        db.save(history.get_entry('d1', 'modified amount', 'system',
+                                  initial, doc, sequence, checkpoint,
+                                  timestamp=timestamp))
+        initial = copy.deepcopy(doc)
+        states.append(initial)
+    return states
+
+def check_sequence(interval=3):
+    "Entries sharing a timestamp must get distinct sequence numbers."
+    db = memdb.Database()
+    log_changes(db, 4 * interval, interval)
+    rows = list(db.view('log/docid_sequence'))
+    sequences = [r.key[1] for r in rows]
+    assert sequences == range(1, 4 * interval + 1), sequences
+    checkpoints = [r.key[1] for r in rows if r.value['checkpoint']]
+    assert checkpoints == range(1, 4 * interval + 1, interval), checkpoints
+    print 'sequence OK'
+
+def check_revision(interval=3):
+    "Every logged revision must be reconstructed from its checkpoint."
+    db = memdb.Database()
+    states = log_changes(db, 4 * interval, interval)
+    for state in states:
+        revision = history.get_revision(db, 'd1', state['_rev'])
+        assert revision == state, (revision, state)
+    assert history.get_revision(db, 'd1', '99-none') is None
+    print 'revision OK'
+
+
+if __name__ == '__main__':
+    try:
+        check_sequence()
+        check_revision()
+    except AssertionError, msg:
+        print 'FAILED', msg
+        sys.exit(1)
@@ -0,0 +1,46 @@
+""" slog: Simple sample tracker system.
+
+Check the request-scoped identity map of the dispatcher: a document
+is the same object however it was fetched during the request. Uses
+the in-memory database; requires the web framework modules.
+
+Per Kraulis
+2011-04-14
+"""
+
+import sys
+
+from slog import memdb
+from slog.dispatcher import Dispatcher
+
+
+def get_dispatcher(db):
+    "Return a dispatcher set up as by 'prepare', without a request."
+    dispatcher = Dispatcher.__new__(Dispatcher)
+    dispatcher.db = db
+    dispatcher.documents = dict()
+    dispatcher.named_documents = dict()
+    return dispatcher
+
+def check_named_documents():
+    "Bulk and single name lookups must give the identical document."
+    db = memdb.Database()
+    for i in xrange(3):
+        db.save(dict(_id="s%i" % i, entity='sample', name="S%i" % i))
+    dispatcher = get_dispatcher(db)
+    docs, missing = dispatcher.get_named_documents('sample',
+                                                   ['S0', 'S1', 'S9'])
+    assert missing == ['S9'], missing
+    for name in ['S0', 'S1']:
+        assert docs[name] is dispatcher.get_named_document('sample', name), \
+               "bulk lookup of %s not in identity map" % name
+        assert docs[name] is dispatcher.get_document_by_id(docs[name].id)
+    print 'named documents OK'
+
+
+if __name__ == '__main__':
+    try:
+        check_named_documents()
+    except AssertionError, msg:
+        print 'FAILED', msg
+        sys.exit(1)
@@ -0,0 +1,115 @@
+""" slog: Simple sample tracker system.
+
+Check the view indexes of the in-memory database: an index is reused
+by repeated queries until the database changes, and the rows located
+by bisection are those selected by filtering all rows of the view.
+
+Per Kraulis
+2011-04-14
+"""
+
+import sys, random
+
+from slog import memdb
+from slog.utils import collation_key
+from slog.views import VIEWS
+
+from synthetic_lab import make_lab
+
+
+class CountingMap(object):
+    "Map function counting the documents it is called for."
+
+    def __init__(self, function):
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, doc):
+        self.calls += 1
+        return self.function(doc)
+
+
+def check_index_reuse():
+    "Repeated queries must not rerun the map function until a change."
+    views = dict(VIEWS)
+    counter = CountingMap(VIEWS['sample/name'][0])
+    views['sample/name'] = (counter, None)
+    db = memdb.Database(views=views)
+    for i in xrange(10):
+        db.save(dict(entity='sample', name="S%i" % i))
+    for i in xrange(5):
+        list(db.view('sample/name'))
+        list(db.view('sample/name', key='S3'))
+        list(db.view('sample/name', keys=['S1', 'S2']))
+    assert counter.calls == 10, "map called %i times" % counter.calls
+    db.save(dict(entity='sample', name='S10'))
+    assert len(db.view('sample/name')) == 11
+    assert counter.calls == 21, "map called %i times" % counter.calls
+    print 'index reuse OK'
+
+def select_rows(rows, key=memdb.NOT_GIVEN, keys=None,
+                startkey=None, endkey=None,
+                startkey_docid=None, endkey_docid=None,
+                inclusive_end=True, descending=False):
+    "Select the rows by filtering all of them."
+    rows = list(rows)
+    if descending:
+        rows.reverse()
+    if keys is not None:
+        return [r for k in keys for r in rows
+                if collation_key(r[0]) == collation_key(k)]
+    if key is not memdb.NOT_GIVEN:
+        return [r for r in rows if collation_key(r[0]) == collation_key(key)]
+    sign = descending and -1 or 1
+    def compare(row, bound, docid):
+        result = cmp(collation_key(row[0]), collation_key(bound))
+        if result == 0 and docid is not None:
+            result = cmp(row[1], docid)
+        return sign * result
+    if startkey is not None:
+        rows = [r for r in rows if compare(r, startkey, startkey_docid) >= 0]
+    if endkey is not None:
+        if inclusive_end:
+            rows = [r for r in rows if compare(r, endkey, endkey_docid) <= 0]
+        else:
+            rows = [r for r in rows if compare(r, endkey, endkey_docid) < 0]
+    return rows
+
+def check_bisection(queries=300, seed=1):
+    "Bisection must select the same rows as filtering, for all options."
+    db = memdb.Database()
+    make_lab(db, scale='small')
+    random.seed(seed)
+    for i in xrange(queries):
+        name = random.choice(['sample/name', 'project/customer_name',
+                              'log/docid_timestamp', 'all/search'])
+        all_rows = db.get_rows(name)
+        pick = lambda: random.choice(all_rows)
+        options = dict(descending=random.random() < 0.5)
+        choice = random.random()
+        if choice < 0.2:
+            options['key'] = pick()[0]
+        elif choice < 0.3:
+            options['keys'] = [pick()[0] for j in xrange(3)]
+        else:
+            for bound in ('startkey', 'endkey'):
+                if random.random() < 0.7:
+                    row = pick()
+                    options[bound] = row[0]
+                    if random.random() < 0.5:
+                        options[bound + '_docid'] = row[1]
+            options['inclusive_end'] = random.random() < 0.7
+        expected = [(r[0], r[1]) for r in select_rows(all_rows, **options)]
+        rows, total, offset = db.query(name, **options)
+        result = [(r.key, r.id) for r in rows]
+        assert result == expected, "%s %s" % (name, options)
+    print 'bisection OK'
+
+
+if __name__ == '__main__':
+    try:
+        check_index_reuse()
+        check_bisection()
+    except AssertionError, msg:
+        print 'FAILED', msg
+        sys.exit(1)
@@ -0,0 +1,84 @@
+""" slog: Simple sample tracker system.
+
+Check the cursor pagination of the list pages: walking the pages
+forward gives the rows of the view in order, and an incomplete cursor
+is rejected. Uses the in-memory database; requires the web framework
+modules.
+
+Per Kraulis
+2011-04-15
+"""
+
+import sys, re, urlparse
+
+from slog import memdb
+from slog.dispatcher import Dispatcher, HTTP_BAD_REQUEST
+
+from synthetic_lab import make_lab
+
+
+NEXT_LINK_RX = re.compile(r'<a href="([^"]*)"\s*>Next</a>', re.IGNORECASE)
+
+
+class Request(dict):
+    "Stand-in for the request, giving the CGI field values."
+
+    def get(self, name):
+        return dict.get(self, name)
+
+
+def get_dispatcher(db):
+    "Return a dispatcher set up as by 'prepare', without a request."
+    dispatcher = Dispatcher.__new__(Dispatcher)
+    dispatcher.db = db
+    dispatcher.documents = dict()
+    dispatcher.named_documents = dict()
+    return dispatcher
+
+def get_next_request(navigation):
+    "Return the request for the 'Next' link, or None if no such link."
+    if navigation is None: return None
+    match = NEXT_LINK_RX.search(str(navigation))
+    if not match: return None
+    query = urlparse.urlparse(match.group(1).replace('&amp;', '&')).query
+    return Request(urlparse.parse_qsl(query))
+
+def check_walk(size=7):
+    "The pages must give all rows of the view, in view order."
+    db = memdb.Database()
+    make_lab(db, scale='small')
+    dispatcher = get_dispatcher(db)
+    request = Request(page_size=str(size))
+    ids = []
+    while request is not None:
+        rows, navigation = dispatcher.get_page(request, 'workset/name',
+                                               'worksets')
+        assert len(rows) <= size
+        ids.extend([r.id for r in rows])
+        request = get_next_request(navigation)
+    assert ids == [r.id for r in db.view('workset/name')]
+    print 'walk OK'
+
+def check_incomplete_cursor():
+    "A cursor key without document id must be a bad request."
+    db = memdb.Database()
+    make_lab(db, scale='small')
+    dispatcher = get_dispatcher(db)
+    key = list(db.view('workset/name', limit=1))[0].key
+    request = Request(page_key='"%s"' % key, page_dir='next')
+    try:
+        dispatcher.get_page(request, 'workset/name', 'worksets')
+    except HTTP_BAD_REQUEST:
+        pass
+    else:
+        raise AssertionError('page key without page docid accepted')
+    print 'incomplete cursor OK'
+
+
+if __name__ == '__main__':
+    try:
+        check_walk()
+        check_incomplete_cursor()
+    except AssertionError, msg:
+        print 'FAILED', msg
+        sys.exit(1)
@@ -0,0 +1,81 @@
+""" slog: Simple sample tracker system.
+
+Check that the database pool keeps handing out pooled instances when
+the threads that held them have exited, as with thread recycling or a
+thread-per-request server. No CouchDB server is needed.
+
+Per Kraulis
+2011-04-14
+"""
+
+import sys, threading
+
+from slog.configuration import DatabasePool
+
+
+class Opener(object):
+    "Create distinct stand-in database instances, counting them."
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self):
+        self.count += 1
+        return object()
+
+
+def run_threads(pool, number, requests=3):
+    """Run the threads one after the other, each getting the instance
+    for a number of requests. Return the list of per-thread results:
+    True if the thread got the same instance on every request."""
+    results = []
+    def worker():
+        instances = [pool.get() for i in xrange(requests)]
+        results.append(len(set([id(db) for db in instances])) == 1)
+    for i in xrange(number):
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    return results
+
+def check_exited_threads(size=4):
+    "New threads must still be pooled after earlier threads have exited."
+    opener = Opener()
+    pool = DatabasePool(size, open=opener)
+    results = run_threads(pool, 3 * size)
+    assert all(results), 'thread got an unpooled instance'
+    stats = pool.get_stats()
+    assert stats['retained'] <= size, stats
+    print 'exited threads OK'
+
+def check_live_threads(size=2):
+    "Threads beyond the size get fresh instances while the others live."
+    opener = Opener()
+    pool = DatabasePool(size, open=opener)
+    release = threading.Event()
+    started = []
+    def holder():
+        pool.get()
+        started.append(True)
+        release.wait()
+    holders = [threading.Thread(target=holder) for i in xrange(size)]
+    for thread in holders:
+        thread.start()
+    while len(started) < size:
+        release.wait(0.01)
+    results = run_threads(pool, 1)
+    release.set()
+    for thread in holders:
+        thread.join()
+    assert results == [False], results
+    assert pool.get_stats()['retained'] == size
+    print 'live threads OK'
+
+
+if __name__ == '__main__':
+    try:
+        check_exited_threads()
+        check_live_threads()
+    except AssertionError, msg:
+        print 'FAILED', msg
+        sys.exit(1)
@@ -0,0 +1,156 @@
+""" slog: Simple sample tracker system.
+
+Check that caches fed from the changes feed followed by the replica
+are updated for changes made in another worker process, using the
+in-memory database.
+
+Per Kraulis
+2011-04-14
+"""
+
+import sys
+
+import couchdb
+
+from slog import memdb, utils
+from slog.cache import Cache
+from slog.replica import Replica, get_discard_listener, get_clear_listener
+from slog.names import NameIndex
+
+
+def get_worker(db):
+    "Return the replica and authentication cache of a new worker."
+    replica = Replica(['account'], interval=0.0)
+    cache = Cache(ttl=300)
+    replica.add_listener(get_discard_listener(cache, ['account']))
+    replica.sync(db)
+    return replica, cache
+
+def authenticate(db, replica, cache, key, name, password):
+    """Authenticate as Dispatcher.authenticate does, using the cache.
+    Return the account document, or None if the login fails."""
+    replica.sync(db)
+    user = cache.get(key)
+    if user is not None:
+        return user
+    user = replica.get('account', name)
+    if user is None or user.get('password') != utils.hexdigest(password):
+        return None
+    cache.set(key, couchdb.Document(user))
+    return user
+
+def check_password_change():
+    "A password changed in one worker must not be accepted by another."
+    db = memdb.Database()
+    db.save(dict(_id='a1', entity='account', name='joakim', role='engineer',
+                 password=utils.hexdigest('old')))
+    first = get_worker(db)
+    second = get_worker(db)
+    assert authenticate(db, *(second + ('k', 'joakim', 'old')))
+    # Changed in the first worker; the login is still cached in the second
+    account = db['a1']
+    account['password'] = utils.hexdigest('new')
+    db.save(account)
+    first[0].apply(account)
+    assert authenticate(db, *(second + ('k', 'joakim', 'old'))) is None, \
+           'old password accepted after change in other worker'
+    assert authenticate(db, *(second + ('k2', 'joakim', 'new')))
+    print 'password change OK'
+
+def check_other_entities():
+    "Changes to other entities must leave the cached logins alone."
+    db = memdb.Database()
+    db.save(dict(_id='a1', entity='account', name='joakim',
+                 password=utils.hexdigest('pw')))
+    replica, cache = get_worker(db)
+    assert authenticate(db, replica, cache, 'k', 'joakim', 'pw')
+    db.save(dict(_id='s1', entity='sample', name='S1'))
+    replica.sync(db)
+    assert cache.get('k') is not None, 'login dropped for sample change'
+    print 'other entities OK'
+
+def check_operator_forms():
+    "The forms must be cleared for accounts created in another worker."
+    db = memdb.Database()
+    replica = Replica(['account'], interval=0.0)
+    forms = Cache(ttl=60)
+    replica.add_listener(get_clear_listener(forms, ['account', 'task']))
+    replica.sync(db)
+    forms.set(('tasks', None), '<form/>')
+    db.save(dict(_id='s1', entity='sample', name='S1'))
+    replica.sync(db)
+    assert forms.get(('tasks', None)), 'forms cleared for sample change'
+    db.save(dict(_id='a2', entity='account', name='new_operator'))
+    replica.sync(db)
+    assert forms.get(('tasks', None)) is None, \
+           'forms kept after account created in other worker'
+    print 'operator forms OK'
+
+class CountingDatabase(object):
+    "Database counting the changes requests and the changes returned."
+
+    def __init__(self, db):
+        self.db = db
+        self.requests = []              # Number of changes per request
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def changes(self, **options):
+        changes = self.db.changes(**options)
+        self.requests.append(len(changes['results']))
+        return changes
+
+def check_batches(limit=10):
+    "The feed must be read in batches, calling listeners without the lock."
+    db = CountingDatabase(memdb.Database())
+    replica = Replica(['account'], interval=0.0, limit=limit)
+    seen = []
+    def listener(change):
+        assert not replica.lock.locked(), 'listener called with lock held'
+        seen.append(change['id'])
+    replica.add_listener(listener)
+    replica.sync(db)
+    for i in xrange(2 * limit + 5):
+        db.save(dict(_id="a%i" % i, entity='account', name="user%i" % i))
+    replica.sync(db)
+    assert max(db.requests) <= limit, db.requests
+    assert len(seen) == 2 * limit + 5, len(seen)
+    assert replica.get('account', "user%i" % (2 * limit + 4))
+    assert replica.seq == db.info()['update_seq']
+    print 'batches OK'
+
+def check_name_index():
+    "The name index must follow the changes passed on by the replica."
+    db = memdb.Database()
+    db.save(dict(_id='p1', entity='project', name='Alpha'))
+    replica = Replica(['account'], interval=0.0)
+    names = NameIndex(replica)
+    assert not names.is_current(), 'index current before replica loaded'
+    replica.sync(db)
+    assert names.is_current()
+    assert names.search(db, 'project', 'al') == ['Alpha']
+    # Changed in another worker
+    project = db['p1']
+    project['name'] = 'Beta'
+    db.save(project)
+    db.save(dict(_id='p2', entity='project', name='alpine'))
+    replica.sync(db)
+    assert names.search(db, 'project', 'al') == ['alpine'], \
+           names.get_names(db, 'project')
+    assert names.get_names(db, 'project') == ['alpine', 'Beta']
+    replica.updated -= replica.max_lag + 1
+    assert not names.is_current(), 'index current with stale replica'
+    print 'name index OK'
+
+
+if __name__ == '__main__':
+    try:
+        check_password_change()
+        check_other_entities()
+        check_operator_forms()
+        check_batches()
+        check_name_index()
+    except AssertionError, msg:
+        print 'FAILED', msg
+        sys.exit(1)
@@ -0,0 +1,143 @@
+""" slog: Simple sample tracker system.
+
+Check that the Python ports of the views in 'views' give the same
+results as the JavaScript views under 'designs/' on a fixture set.
+The JavaScript map functions are run using 'node'.
+
+Per Kraulis
+2011-04-06
+"""
+
+import os, sys, json, subprocess
+
+from slog.views import VIEWS
+
+
+FIXTURES = [
+    dict(_id='a1', entity='account', name='system', role='admin',
+         fullname='System administrator', timestamp='2011-02-01T09:00:00Z'),
+    dict(_id='a2', entity='account', name='max_kaller', role='manager',
+         tags=['lab', 'Boss'], timestamp='2011-02-02T09:00:00Z'),
+    dict(_id='a3', entity='account', name='joakim', role='customer',
+         fullname='', tags=[]),
+    dict(_id='p1', entity='project', name='J_Johansson_10_01',
+         label='Spruce genome', customer='joakim', operator='max_kaller',
+         tags=['plant'], timestamp='2011-02-01T09:00:00Z'),
+    dict(_id='p2', entity='project', name='T_Tomsson_10_02',
+         customer='max_kaller', timestamp='2011-02-01T12:00:00Z'),
+    dict(_id='s1', entity='sample', name='S00001', project='T_Tomsson_10_02',
+         customername='patient 1', tags=['tumour', 'Exome'],
+         timestamp='2010-12-22T12:34:00Z'),
+    dict(_id='s2', entity='sample', name='S00002',
+         project='J_Johansson_10_01', customername='',
+         timestamp='2011-02-02T11:40:00Z'),
+    dict(_id='s3', entity='sample', name='s00003'),
+    dict(_id='w1', entity='workset', name='W1', operator='max_kaller',
+         samples=['S00001', 'S00002'], tags=['plate'],
+         timestamp='2011-03-01T10:00:00Z'),
+    dict(_id='w2', entity='workset', name='W2', samples=[]),
+    dict(_id='r1', entity='protocol', name='hiseq_run',
+         instruments=['hiseq1', 'hiseq2'], timestamp='2011-03-02T10:00:00Z'),
+    dict(_id='r2', entity='protocol', name='manual'),
+    dict(_id='t1', entity='task', name='run_1', runname='101214_sN188',
+         protocol='hiseq_run', workset='W1', operator='max_kaller',
+         instrument='hiseq1', timestamp='2011-03-03T10:00:00Z'),
+    dict(_id='t2', entity='task', name='run_2', protocol='manual'),
+    dict(_id='i1', entity='instrument', name='hiseq1', label='HiSeq A',
+         type='Illumina HiSeq', operator='max_kaller', tags=['seq'],
+         timestamp='2011-03-04T10:00:00Z'),
+    dict(_id='i2', entity='instrument', name='robot', type='Robot'),
+    dict(_id='l1', entity='log', docid='s1', action='created',
+         account='system', timestamp='2011-03-05T10:00:00Z',
+         sequence=1, checkpoint=True, initial=None),
+    dict(_id='l2', entity='log', docid='s1', action='modified amount',
+         account='system', timestamp='2011-03-06T10:00:00Z',
+         comment='weighed again', sequence=2, rev='3-abc'),
+    dict(_id='l3', entity='log', docid='s2', action='created'),
+    dict(_id='x1', name='no entity', timestamp='2011-03-07T10:00:00Z')]
+
+NODE_RUNNER = """
+var docs = %s;
+var rows = [];
+var current;
+function emit(key, value) {
+    rows.push([key === undefined ? null : key,
+               current._id,
+               value === undefined ? null : value]);
+}
+var map = eval('(' + %s + ')');
+docs.forEach(function(doc) { current = doc; map(doc); });
+console.log(JSON.stringify(rows));
+"""
+
+
+def get_javascript_views(root='designs'):
+    "Return a dictionary of the views: (map code, reduce code)."
+    result = dict()
+    for design in sorted(os.listdir(root)):
+        path = os.path.join(root, design, 'views')
+        if not os.path.isdir(path): continue
+        for filename in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(filename)
+            if ext != '.js': continue
+            code = open(os.path.join(path, filename)).read()
+            if name.startswith('reduce_'):
+                key = 1
+                name = name[len('reduce_'):]
+            else:
+                key = 0
+                if name.startswith('map_'):
+                    name = name[len('map_'):]
+            view = result.setdefault("%s/%s" % (design, name), [None, None])
+            view[key] = code.strip()
+    return result
+
+def run_javascript_map(code, docs):
+    "Return the sorted rows emitted by the JavaScript map function."
+    script = NODE_RUNNER % (json.dumps(docs), json.dumps(code))
+    process = subprocess.Popen(['node'],
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE)
+    output = process.communicate(script)[0]
+    if process.returncode != 0:
+        raise ValueError('node failed to run map function')
+    return sorted(json.loads(output))
+
+def run_python_map(function, docs):
+    "Return the sorted rows emitted by the Python map function."
+    rows = []
+    for doc in docs:
+        for key, value in function(doc):
+            rows.append([key, doc['_id'], value])
+    return sorted(json.loads(json.dumps(rows)))
+
+def check_views(root='designs', docs=FIXTURES):
+    "Compare all views. Return the list of names of those that differ."
+    failed = []
+    javascript_views = get_javascript_views(root)
+    for name in sorted(set(javascript_views).union(VIEWS)):
+        try:
+            map_code, reduce_code = javascript_views[name]
+            map_function, reduce_function = VIEWS[name]
+        except KeyError:
+            print name, 'MISSING'
+            failed.append(name)
+            continue
+        if run_javascript_map(map_code, docs) != \
+           run_python_map(map_function, docs):
+            print name, 'DIFFERENT MAP'
+            failed.append(name)
+        elif reduce_code != reduce_function:
+            print name, 'DIFFERENT REDUCE'
+            failed.append(name)
+        else:
+            print name, 'OK'
+    return failed
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        failed = check_views(root=sys.argv[1])
+    else:
+        failed = check_views()
+    sys.exit(failed and 1 or 0)
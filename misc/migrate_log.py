@@ -0,0 +1,59 @@
+""" slog: Simple sample tracker system.
+
+Convert the log entries from the old format, containing a full copy of
+the 'initial' document state, to the delta encoding with checkpoints;
+see module 'history'. Already converted documents are left unchanged,
+so the conversion may be rerun.
+
+Per Kraulis
+2011-04-10
+"""
+
+import couchdb
+
+from slog import configuration, history
+
+
+def get_logged_docids(db):
+    "Return the set of ids of documents having log entries in old format."
+    result = set()
+    for row in db.view('log/docid_timestamp'):
+        if not row.value.get('sequence'):
+            result.add(row.key[0])
+    return result
+
+def migrate_document_log(db, docid):
+    """Convert the log entries for the document.
+    Return the list of entries to save."""
+    entries = history.get_log_entries(db, docid)
+    try:
+        current = db[docid]
+    except couchdb.ResourceNotFound:
+        current = None
+    states = history.get_legacy_states(entries, current)
+    result = []
+    for entry, converted in zip(entries, history.encode_entries(states)):
+        if converted != entry:
+            result.append(converted)
+    return result
+
+def migrate_log(chunk=500):
+    "Convert all log entries in old format, saving in bulk."
+    db = configuration.get_db()
+    docids = get_logged_docids(db)
+    pending = []
+    count = 0
+    for docid in sorted(docids):
+        pending.extend(migrate_document_log(db, docid))
+        if len(pending) >= chunk:
+            db.update(pending)
+            count += len(pending)
+            pending = []
+    if pending:
+        db.update(pending)
+        count += len(pending)
+    print count, 'log entries converted for', len(docids), 'documents'
+
+
+if __name__ == '__main__':
+    migrate_log()
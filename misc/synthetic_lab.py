@@ -0,0 +1,195 @@
+""" slog: Simple sample tracker system.
+
+Create a synthetic lab of configurable scale, for benchmarks.
+All accounts have the password 'password'.
+
+Per Kraulis
+2011-04-07
+"""
+
+import random, copy
+
+from slog import utils, history
+
+
+SCALES = dict(small=dict(accounts=10,
+                         projects=20,
+                         samples=10,
+                         worksets=10,
+                         tasks=10,
+                         log_depth=3),
+              medium=dict(accounts=50,
+                          projects=500,
+                          samples=40,
+                          worksets=200,
+                          tasks=200,
+                          log_depth=10),
+              large=dict(accounts=200,
+                         projects=5000,
+                         samples=40,
+                         worksets=2000,
+                         tasks=2000,
+                         log_depth=20))
+
+PASSWORD = 'password'
+
+
+class SyntheticLab(object):
+    "Generator of the documents for a synthetic lab."
+
+    def __init__(self, db, seed=1):
+        self.db = db
+        self.random = random.Random(seed)
+        self.count = 0
+        self.accounts = []
+        self.projects = []
+        self.samples = []
+        self.worksets = []
+        self.protocols = []
+        self.instruments = []
+        self.tasks = []
+
+    def timestamp(self):
+        "Return a consecutive timestamp, for a realistic history."
+        self.count += 1
+        return "2011-%02i-%02iT%02i:%02i:%02iZ" % (1 + (self.count/100000)%12,
+                                                  1 + (self.count/4000) % 28,
+                                                  (self.count/240) % 24,
+                                                  (self.count/60) % 60,
+                                                  self.count % 60)
+
+    def save(self, doc, log_depth=0):
+        "Save the document, with a history of log entries."
+        doc['_id'] = utils.id_uuid()
+        doc['timestamp'] = self.timestamp()
+        self.db.save(doc)
+        initial = None
+        for i in xrange(log_depth):
+            self.db.save(history.get_entry(
+                doc['_id'],
+                i and 'modified description' or 'created',
+                self.random.choice(self.accounts)['name'],
+                initial,
+                doc,
+                sequence=i + 1,
+                checkpoint=i % history.CHECKPOINT_INTERVAL == 0,
+                timestamp=self.timestamp()))
+            initial = copy.deepcopy(doc)
+        return doc
+
+    def create(self, accounts=10, projects=20, samples=10, worksets=10,
+               tasks=10, protocols=5, instruments=4, log_depth=3):
+        """Create the documents. 'samples' is the number per project.
+        The worksets have full 8x12 grids."""
+        self.accounts.append(dict(entity='account',
+                                  name='system',
+                                  role='admin',
+                                  password=utils.hexdigest(PASSWORD),
+                                  fullname='System administrator'))
+        self.save(self.accounts[0])
+        for i in xrange(accounts):
+            role = self.random.choice(['customer', 'customer', 'customer',
+                                       'engineer', 'engineer', 'manager'])
+            self.accounts.append(self.save(dict(
+                entity='account',
+                name="account_%04i" % i,
+                role=role,
+                password=utils.hexdigest(PASSWORD),
+                fullname="Surname%i, Given" % i,
+                initials="SG%i" % i,
+                email="account_%04i@example.com" % i,
+                tags=self.random.sample(['lab', 'pi', 'external', 'staff'], 1)),
+                                            log_depth=log_depth))
+        customers = [a['name'] for a in self.accounts
+                     if a['role'] == 'customer'] or ['system']
+        operators = [a['name'] for a in self.accounts
+                     if a['role'] != 'customer']
+        for i in xrange(instruments):
+            self.instruments.append(self.save(dict(
+                entity='instrument',
+                name="instrument_%02i" % i,
+                label="Instrument %i" % i,
+                type=i % 2 and 'Robot' or 'Illumina HiSeq',
+                operator=self.random.choice(operators),
+                max_rows=1,
+                max_columns=8,
+                max_multiplex=12),
+                                               log_depth=log_depth))
+        for i in xrange(protocols):
+            self.protocols.append(self.save(dict(
+                entity='protocol',
+                name="protocol_%02i" % i,
+                description="Protocol number %i." % i,
+                instruments=[d['name'] for d in self.instruments[i%2::2]],
+                steps=["step %i" % j for j in xrange(5)]),
+                                             log_depth=log_depth))
+        for i in xrange(projects):
+            project = self.save(dict(
+                entity='project',
+                name="P_Project_11_%05i" % i,
+                label="Project %i" % i,
+                description="Synthetic project number %i." % i,
+                customer=self.random.choice(customers),
+                operator=self.random.choice(operators),
+                reference='hg19',
+                tags=self.random.sample(['exome', 'genome', 'rna', 'chip'],2)),
+                                log_depth=log_depth)
+            self.projects.append(project['name'])
+            for j in xrange(samples):
+                sample = self.save(dict(
+                    entity='sample',
+                    name="S%07i" % len(self.samples),
+                    customername="customer sample %i" % j,
+                    project=project['name'],
+                    reference='hg19',
+                    amount=self.random.uniform(1.0, 10.0),
+                    concentration=self.random.uniform(0.1, 2.0),
+                    multiplex_label="index%i" % (j % 12 + 1)),
+                                   log_depth=min(log_depth, 2))
+                self.samples.append(sample['name'])
+        for i in xrange(worksets):
+            names = self.random.sample(self.samples, min(96,len(self.samples)))
+            names.sort()
+            padded = names + [None] * (96 - len(names))
+            arrangement = [[[padded[row*12 + column]]
+                            for column in xrange(12)]
+                           for row in xrange(8)]
+            workset = self.save(dict(
+                entity='workset',
+                name="W%06i" % i,
+                description="Synthetic workset number %i." % i,
+                operator=self.random.choice(operators),
+                samples=names,
+                grid=dict(rows=8, columns=12, multiplex=1,
+                          arrangement=arrangement)),
+                                log_depth=log_depth)
+            self.worksets.append(workset['name'])
+        for i in xrange(tasks):
+            protocol = self.random.choice(self.protocols)
+            self.tasks.append(self.save(dict(
+                entity='task',
+                name="T%06i" % i,
+                runname="110101_SN%i_%04i_FC%06i" % (i % 3, i, i),
+                protocol=protocol['name'],
+                workset=self.random.choice(self.worksets or [None]),
+                operator=self.random.choice(operators),
+                instrument=self.random.choice(self.instruments)['name'],
+                aux_unit="FC%06i" % i),
+                                        log_depth=log_depth)['name'])
+
+
+def make_lab(db, scale='small', seed=1, **sizes):
+    "Create a synthetic lab of the given scale in the database."
+    params = SCALES[scale].copy()
+    params.update(sizes)
+    lab = SyntheticLab(db, seed=seed)
+    lab.create(**params)
+    return lab
+
+
+if __name__ == '__main__':
+    import sys
+    from slog import memdb
+    db = memdb.Database()
+    make_lab(db, scale=len(sys.argv) > 1 and sys.argv[1] or 'small')
+    print db.info()
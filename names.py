@@ -0,0 +1,122 @@
+""" slog: Simple sample tracker system.
+
+Per-worker cache of the sorted lists of names of the entities, for the
+reference field edit forms and the type-ahead lookup. The list for an
+entity is loaded from its 'name' view when first needed, and is then
+updated incrementally from the changes passed on by the replica, which
+follows the CouchDB changes feed for this worker.
+
+Per Kraulis
+2011-04-11
+"""
+
+import bisect, threading
+
+from . import utils
+from .replica import REPLICA
+
+
+ENTITIES = ('account', 'project', 'sample', 'workset',
+            'protocol', 'task', 'instrument')
+
+
+class NameIndex(object):
+    """Sorted lists of the names of the entities, in CouchDB collation.
+    It is kept up to date by the changes which the replica passes on to
+    it, and is not used when the replica is not current."""
+
+    def __init__(self, replica):
+        self.replica = replica
+        self.lock = threading.Lock()
+        self.keys = dict()              # Key: entity, value: collation keys
+        self.names = dict()             # Key: entity, value: names, same order
+        self.ids = dict()               # Key: id, value: (entity, name)
+        replica.add_listener(self.follow)
+
+    def is_current(self):
+        "May the index be used?"
+        return self.replica.is_current()
+
+    def get_names(self, db, entity):
+        "Return the sorted list of names of the documents of the entity."
+        self.load(db, entity)
+        with self.lock:
+            return list(self.names[entity])
+
+    def get_count(self, db, entity):
+        "Return the number of documents of the entity."
+        self.load(db, entity)
+        with self.lock:
+            return len(self.names[entity])
+
+    def search(self, db, entity, prefix, limit=20):
+        """Return at most 'limit' names of the entity starting with
+        the prefix, ignoring case, in sorted order."""
+        self.load(db, entity)
+        prefix = prefix.lower()
+        result = []
+        with self.lock:
+            keys = self.keys[entity]
+            pos = bisect.bisect_left(keys, (4, prefix))
+            while pos < len(keys) and len(result) < limit:
+                if not keys[pos][1].startswith(prefix): break
+                result.append(self.names[entity][pos])
+                pos += 1
+        return result
+
+    def apply(self, doc):
+        "Update the index for the document. The lock must not be held."
+        with self.lock:
+            self.remove(doc['_id'])
+            self.insert(doc)
+
+    def insert(self, doc):
+        "Insert the name of the document, if loaded. The lock must be held."
+        entity = doc.get('entity')
+        name = doc.get('name')
+        if entity not in self.names or not name: return
+        key = utils.collation_key(name)
+        pos = bisect.bisect_left(self.keys[entity], key)
+        self.keys[entity].insert(pos, key)
+        self.names[entity].insert(pos, name)
+        self.ids[doc['_id']] = (entity, name)
+
+    def remove(self, id):
+        "Remove the name of the document, if any. The lock must be held."
+        try:
+            entity, name = self.ids.pop(id)
+        except KeyError:
+            return
+        key = utils.collation_key(name)
+        pos = bisect.bisect_left(self.keys[entity], key)
+        while self.names[entity][pos] != name:
+            pos += 1
+        del self.keys[entity][pos]
+        del self.names[entity][pos]
+
+    def load(self, db, entity):
+        """Load the names of the entity, unless already done. Changes
+        made while loading are passed on again by the replica, which
+        does no harm."""
+        if entity not in ENTITIES:
+            raise ValueError("no such entity '%s'" % entity)
+        if entity in self.names: return
+        rows = list(db.view("%s/name" % entity))
+        with self.lock:
+            if entity in self.names: return
+            self.names[entity] = [r.key for r in rows]
+            self.keys[entity] = [utils.collation_key(r.key) for r in rows]
+            for row in rows:
+                self.ids[row.id] = (entity, row.key)
+
+    def follow(self, change):
+        """Apply a change from the feed followed by the replica.
+        Called by the replica as a listener."""
+        with self.lock:
+            self.remove(change['id'])
+            doc = change.get('doc')
+            if doc and not change.get('deleted'):
+                self.insert(doc)
+
+
+NAMES = NameIndex(REPLICA)
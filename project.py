@@ -159,30 +159,41 @@ class Projects(Dispatcher):
                                method='GET',
                                action=configuration.get_url('project'))))
 
-        view = self.db.view('sample/project_count', group=True)
-        counts = dict([(r.key, r.value) for r in view])
-        rows = [TR(TH('Project'),
-                   TH('Label'),
-                   TH('Customer'),
-                   TH('# Samples'),
-                   TH('Timestamp'))]
-        view = self.db.view('project/timestamp',
-                            descending=True,
-                            include_docs=True)
-        for result in view:
-            doc = result.doc
-            project = A(doc['name'],
-                        href=configuration.get_url('project', doc['name']))
+        results, navigation = self.get_page(request,
+                                            'project/list',
+                                            'projects',
+                                            descending=True)
+        names = [r.value['name'] for r in results]
+        if names:
+            view = self.db.view('sample/project_count', keys=names, group=True)
+            counts = dict([(r.key, r.value) for r in view])
+        else:
+            counts = dict()
+        page.append(StreamedTable(TR(TH('Project'),
+                                     TH('Label'),
+                                     TH('Customer'),
+                                     TH('# Samples'),
+                                     TH('Timestamp')),
+                                  self.get_rows(results, counts),
+                                  border=1))
+        if navigation:
+            page.append(navigation)
+
+        page.write(response)
+
+    def get_rows(self, results, counts):
+        "Generate the table rows for the projects, most recent first."
+        for result in results:
+            summary = result.value
+            project = A(summary['name'],
+                        href=configuration.get_url('project', summary['name']))
             # Defensive programming: in reality always defined
-            customer = doc.get('customer')
+            customer = summary['customer']
             if customer:
                 customer = A(customer,
                              href=configuration.get_url('account', customer))
-            rows.append(TR(TD(project),
-                           TD(result.value or ''),
-                           TD(customer),
-                           TD(str(counts.get(doc['name'], 0))),
-                           TD(result.key)))
-        page.append(TABLE(border=1, *rows))
-
-        page.write(response)
+            yield TR(TD(project),
+                     TD(summary['label'] or ''),
+                     TD(customer or ''),
+                     TD(str(counts.get(summary['name'], 0))),
+                     TD(summary['timestamp'] or ''))
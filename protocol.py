@@ -138,15 +138,18 @@ class Protocols(Dispatcher):
                                method='GET',
                                action=configuration.get_url('protocol'))))
 
-        view = self.db.view('protocol/name', include_docs=True)
+        results, navigation = self.get_page(request,
+                                            'protocol/list',
+                                            'protocols')
         rows = [TR(TH('Protocol'),
                    TH('Timestamp'))]
-        for result in view:
-            doc = result.doc
-            protocol = A(doc['name'],
-                        href=configuration.get_url('protocol', doc['name']))
+        for result in results:
+            protocol = A(result.key,
+                        href=configuration.get_url('protocol', result.key))
             rows.append(TR(TD(protocol),
-                           TD(doc['timestamp'])))
+                           TD(result.value['timestamp'] or '')))
         page.append(TABLE(border=1, *rows))
+        if navigation:
+            page.append(navigation)
 
         page.write(response)
@@ -0,0 +1,183 @@
+""" slog: Simple sample tracker system.
+
+Per-worker in-memory replica of the documents of small, rarely changed
+entities, kept current by following the CouchDB changes feed. Other
+per-worker caches may register listeners, to which each change in the
+feed is passed on.
+
+Per Kraulis
+2011-04-08
+"""
+
+import time, copy, threading, logging
+
+import couchdb
+
+from . import configuration, utils
+
+
+def get_revision_number(doc):
+    "Return the leading integer of the document revision."
+    try:
+        return int(doc['_rev'].split('-', 1)[0])
+    except (KeyError, ValueError):
+        return 0
+
+
+class Replica(object):
+    """In-memory copy of all documents of the given entities.
+    It is brought up to date from the changes feed at most once per
+    'interval' seconds, reading at most 'limit' changes per request.
+    If the last successful update is older than 'max_lag' seconds,
+    then the replica is not used."""
+
+    def __init__(self, entities, interval=2.0, max_lag=30.0, limit=500):
+        self.entities = set(entities)
+        self.interval = interval
+        self.max_lag = max_lag
+        self.limit = limit
+        self.lock = threading.Lock()    # For the documents
+        self.updating = threading.Lock() # Held by the updating thread
+        self.docs = dict()              # Key: id
+        self.names = dict()             # Key: (entity, name), value: id
+        self.seq = None                 # Sequence number of changes feed
+        self.updated = 0.0              # Time of last successful update
+        self.listeners = []             # Functions called for each change
+
+    def add_listener(self, listener):
+        """Register a function to be called with each change from the
+        feed, including those for other entities. It is called without
+        the lock held, by one thread at a time."""
+        self.listeners.append(listener)
+
+    def is_current(self, entity=None):
+        """May the replica be used for reading documents of the entity?
+        If no entity is given: is the replica following the changes feed,
+        so that caches fed by its listeners may be used?"""
+        if entity is not None and entity not in self.entities:
+            return False
+        return self.seq is not None and \
+               time.time() - self.updated <= self.max_lag
+
+    def get(self, entity, name):
+        "Return a copy of the document, or None if no such."
+        with self.lock:
+            try:
+                doc = self.docs[self.names[(entity, name)]]
+            except KeyError:
+                return None
+            return couchdb.Document(copy.deepcopy(doc))
+
+    def get_names(self, entity):
+        "Return the sorted list of names of the documents of the entity."
+        with self.lock:
+            names = [n for e, n in self.names if e == entity]
+        names.sort(key=utils.collation_key)
+        return names
+
+    def apply(self, doc):
+        """Put the document into the replica, unless an equal or
+        newer revision is already there."""
+        if doc.get('entity') not in self.entities: return
+        with self.lock:
+            current = self.docs.get(doc['_id'])
+            if current and \
+               get_revision_number(current) >= get_revision_number(doc):
+                return
+            self.remove(doc['_id'])
+            self.docs[doc['_id']] = copy.deepcopy(dict(doc))
+            self.names[(doc['entity'], doc.get('name'))] = doc['_id']
+
+    def remove(self, id):
+        "Remove the document from the replica. The lock must be held."
+        doc = self.docs.pop(id, None)
+        if doc is not None:
+            self.names.pop((doc['entity'], doc.get('name')), None)
+
+    def sync(self, db):
+        """Update the replica, if the interval has passed since the last
+        update. Only one thread updates at a time; the others proceed,
+        using the replica as it is until the update is done."""
+        if time.time() - self.updated < self.interval: return
+        if not self.updating.acquire(False): return
+        try:
+            if self.seq is None:
+                self.load(db)
+            else:
+                self.follow(db)
+            self.updated = time.time()
+        except (couchdb.HTTPError, IOError), msg:
+            logging.warning("replica update failed: %s", msg)
+        finally:
+            self.updating.release()
+
+    def load(self, db):
+        "Load all documents. The updating lock must be held."
+        seq = db.info()['update_seq']
+        docs = dict()
+        names = dict()
+        for entity in self.entities:
+            for row in db.view("%s/name" % entity, include_docs=True):
+                docs[row.id] = dict(row.doc)
+                names[(entity, row.key)] = row.id
+        with self.lock:
+            self.docs = docs
+            self.names = names
+        self.seq = seq
+
+    def follow(self, db):
+        """Apply the changes since the last update, in batches, and pass
+        them on to the listeners. The updating lock must be held."""
+        while True:
+            changes = db.changes(since=self.seq,
+                                 include_docs=True,
+                                 limit=self.limit)
+            results = changes['results']
+            with self.lock:
+                for change in results:
+                    doc = change.get('doc')
+                    self.remove(change['id'])
+                    if change.get('deleted') or not doc or \
+                       doc.get('entity') not in self.entities:
+                        continue
+                    self.docs[change['id']] = doc
+                    self.names[(doc['entity'], doc.get('name'))] = \
+                        change['id']
+            for change in results:
+                for listener in self.listeners:
+                    listener(change)
+            if changes['last_seq'] == self.seq: break
+            self.seq = changes['last_seq']
+            if len(results) < self.limit: break
+
+
+def get_discard_listener(cache, entities):
+    """Return a listener dropping the items of the cache whose value is
+    a document that has changed, if of any of the given entities or
+    deleted. This invalidates the cache also for changes made in other
+    worker processes."""
+    def listener(change):
+        doc = change.get('doc') or dict()
+        if not change.get('deleted') and doc.get('entity') not in entities:
+            return
+        cache.discard(lambda value: value.get('_id') == change['id'])
+    return listener
+
+def get_clear_listener(cache, entities):
+    """Return a listener clearing the cache when a document of any of the
+    given entities has changed or a document has been deleted. This
+    invalidates the cache also for changes made in other worker processes."""
+    def listener(change):
+        doc = change.get('doc') or dict()
+        if not change.get('deleted') and doc.get('entity') not in entities:
+            return
+        cache.clear()
+    return listener
+
+
+REPLICA = Replica(getattr(configuration.site, 'REPLICA_ENTITIES',
+                          ['account', 'protocol', 'instrument']),
+                  interval=getattr(configuration.site, 'REPLICA_INTERVAL', 2.0),
+                  max_lag=getattr(configuration.site, 'REPLICA_MAX_LAG', 30.0),
+                  limit=getattr(configuration.site,
+                                'REPLICA_CHANGES_LIMIT', 500))
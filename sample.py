@@ -234,14 +234,17 @@ class SampleCreate(EntityCreate):
                     sample[key] = value
             # Skip entry if no name given
             if not sample.has_key('name'): continue
-            # Check unique name
-            view = self.db.view('sample/name')
-            if len(view[sample['name']]):
+            samples.append((slot, sample))
+        # Check unique names
+        docs, missing = self.get_named_documents('sample',
+                                                 [s['name'] for i,s in samples])
+        for slot, sample in samples:
+            if docs.has_key(sample['name']):
                 raise HTTP_BAD_REQUEST("sample %i name '%s' is already used"
                                        % (slot+1, sample['name']))
-            samples.append(sample)
+        samples = [s for i, s in samples]
         for sample in samples:
-            self.db.save(sample)
+            self.save(sample)
             self.log(sample['_id'], 'created')
         samplelist = ', '.join([s['name'] for s in samples])
         self.log(self.project.id,
@@ -252,7 +255,9 @@ class SampleCreate(EntityCreate):
 
 
 class Samples(Dispatcher):
-    "Samples list page dispatcher."
+    """Samples list page dispatcher. The projects are shown a page at
+    a time, and the samples of all projects on a page are obtained in
+    a single query, without loading the sample documents."""
 
     def GET(self, request, response):
         self.check_viewable(self.user)
@@ -265,34 +270,54 @@ class Samples(Dispatcher):
             page.append(P(self.get_operator_select_form('samples', operator)))
         else:                           # Customer can only view his own samples
             operator = self.user['name']
-        view = self.db.view('project/customer')
+        size = getattr(configuration.site, 'SAMPLES_PROJECT_PAGE_SIZE', 50)
         if operator:
-            result = list(view[operator])
+            results, navigation = self.get_page(request,
+                                                'project/customer_name',
+                                                'samples',
+                                                startkey=[operator],
+                                                endkey=[operator, {}],
+                                                size=size,
+                                                fields=dict(operator=operator))
+            projects = [r.key[1] for r in results]
         else:
-            result = list(view)
-        projects = [r.value for r in result]
+            results, navigation = self.get_page(request,
+                                                'project/name',
+                                                'samples',
+                                                size=size,
+                                                fields=dict(operator='all'))
+            projects = [r.key for r in results]
+        page.append(StreamedTable(TR(TH('Project'),
+                                     TH('Sample'),
+                                     TH('Customername')),
+                                  self.get_rows(projects),
+                                  border=1))
+        if navigation:
+            page.append(navigation)
+        page.write(response)
 
-        rows = [TR(TH('Project'),
-                   TH('Sample'),
-                   TH('Customername'))]
+    def get_rows(self, projects):
+        """Generate the table rows for the samples of the projects.
+        Their names and customernames are obtained in one query."""
+        samples = dict([(p, []) for p in projects])
+        if projects:
+            view = self.db.view('sample/project_list', keys=projects)
+            for result in view:
+                samples[result.key].append(result.value)
         for project in projects:
             link_project = A(project,
                              href=configuration.get_url('project', project))
-            view = self.db.view('sample/project', include_docs=True)
-            samples = [r.doc for r in view[project]]
-            if samples:
-                samples.sort(lambda i, j: cmp(i['name'], j['name']))
-                for sample in samples:
+            rows = sorted(samples[project])
+            if rows:
+                for name, customername in rows:
                     if link_project:
-                        cells = [TD(link_project, rowspan=len(samples))]
+                        cells = [TD(link_project, rowspan=len(rows))]
                         link_project = None # Skip after first row
                     else:
                         cells = []
-                    url = configuration.get_entity_url(sample)
-                    cells.append(TD(A(sample['name'], href=url)))
-                    cells.append(TD(sample.get('customername') or ''))
-                    rows.append(TR(*cells))
+                    url = configuration.get_url('sample', name)
+                    cells.append(TD(A(name, href=url)))
+                    cells.append(TD(customername or ''))
+                    yield TR(*cells)
             else:
-                rows.append(TR(TD(link_project)))
-        page.append(TABLE(border=1, *rows))
-        page.write(response)
+                yield TR(TD(link_project))
@@ -13,8 +13,13 @@ from wireframe.response import *
 from .dispatcher import *
 
 
+# Appended to the lowercased search key to give the end of the range.
+SEARCH_KEY_END = u'\ufff0'
+
+
 class Search(Dispatcher):
-    "Search dispatcher."
+    """Search dispatcher. The searchable attributes of all entities are
+    in one view, so that a search is a single range query."""
 
     def GET(self, request, response):
         self.check_viewable(self.user)
@@ -32,37 +37,13 @@ class Search(Dispatcher):
                            action=configuration.get_url('search'))))
         result = set()
         if key:
-            # Search 'name' and 'tag' fields in all entities
-            for entity in ['account',
-                           'project',
-                           'sample',
-                           'workset',
-                           ## 'application',
-                           'protocol',
-                           'task',
-                           'instrument']:
-                view = self.db.view("%s/name" % entity)
-                for row in view[key : "%sZZZZZZ" % key]:
-                    result.add((entity, row.key))
-                view = self.db.view("%s/tag" % entity)
-                for row in view[key : "%sZZZZZZ" % key]:
-                    result.add((entity, row.value))
-            # Search 'operator' field in Project, Workset, Task, Instrument
-            for entity in ['project',
-                           'workset',
-                           'task',
-                           'instrument']:
-                view = self.db.view("%s/operator" % entity)
-                for row in view[key : "%sZZZZZZ" % key]:
-                    result.add((entity, row.value))
-            # Search 'customername' in Sample entities
-            view = self.db.view("sample/customername")
-            for row in view[key : "%sZZZZZZ" % key]:
-                result.add(('sample', row.value))
-            # Search 'runname' in Task entities
-            view = self.db.view("task/runname")
-            for row in view[key : "%sZZZZZZ" % key]:
-                result.add(('task', row.value))
+            # Name, tags, operator, customername and runname of all entities
+            prefix = unicode(key, 'utf-8', 'replace').lower()
+            view = self.db.view('all/search',
+                                startkey=prefix,
+                                endkey=prefix + SEARCH_KEY_END)
+            for row in view:
+                result.add((row.value[0], row.value[1]))
         rows = []
         for entity, name in sorted(result):
             url = configuration.get_url(entity, name)
@@ -26,3 +26,59 @@ COUCHDB_SERVER   = 'http://localhost:5984/'
 COUCHDB_DATABASE = 'slog'
 COUCHDB_USER     = None
 COUCHDB_PASSWORD = None
+
+# Max number of keep-alive database instances retained per worker process.
+COUCHDB_POOL_SIZE = 10
+
+# Seconds that a successful login is remembered, and max number of logins.
+AUTHENTICATION_CACHE_TTL  = 300
+AUTHENTICATION_CACHE_SIZE = 1000
+
+# Record the database calls for each request; summary shown to admin.
+# This costs time and memory on every call, so enable it only in the
+# site file of an installation being profiled.
+DATABASE_INSTRUMENTATION = False
+
+# Entities kept in an in-memory replica, updated from the changes feed
+# at most every REPLICA_INTERVAL seconds. Not used if the last update
+# is older than REPLICA_MAX_LAG seconds. The changes feed is read in
+# batches of at most REPLICA_CHANGES_LIMIT changes.
+REPLICA_ENTITIES = ['account', 'protocol', 'instrument']
+REPLICA_INTERVAL = 2.0
+REPLICA_MAX_LAG  = 30.0
+REPLICA_CHANGES_LIMIT = 500
+
+# Merge the view directories under 'designs/' into fewer design documents;
+# dictionary {design name: list of directories}. None: one per directory.
+DESIGN_GROUPS = None
+
+# Number of log entries shown per page of an entity log.
+LOG_PAGE_SIZE = 20
+
+# Number of rows shown per page of the entity lists, by default and at most.
+LIST_PAGE_SIZE     = 100
+LIST_PAGE_SIZE_MAX = 1000
+
+# Number of projects shown per page of the Samples list.
+SAMPLES_PROJECT_PAGE_SIZE = 50
+
+# Number of log entries for a document between full checkpoints of its state.
+LOG_CHECKPOINT_INTERVAL = 20
+
+# Max number of rendered reStructuredText items kept in the cache.
+RST_CACHE_SIZE = 1000
+
+# Max number of rendered HTML fragments of entity pages kept in the cache.
+FRAGMENT_CACHE_SIZE = 2000
+
+# Max number of memoized tool enablement results.
+TOOL_ENABLED_CACHE_SIZE = 1000
+
+# Max number and lifetime in seconds of the cached operator selection
+# forms of the list pages.
+OPERATOR_FORM_CACHE_SIZE = 300
+OPERATOR_FORM_CACHE_TTL  = 60
+
+# Reference fields to entities more numerous than this are edited using
+# a text input with type-ahead lookup, instead of a select list.
+REFERENCE_SELECT_MAX = 200
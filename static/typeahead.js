@@ -0,0 +1,64 @@
+/* slog: Simple sample tracker system.
+
+   Type-ahead lookup of entity names for a text input field. The matches
+   for the last word typed are fetched as a JSON list from the given URL,
+   and shown in the element '<name>_matches'. Clicking a match puts it
+   into the field; if 'multiple', then it replaces only the last word.
+
+   Per Kraulis
+   2011-04-11
+*/
+
+function typeahead(name, url, multiple) {
+  var field = document.getElementById(name);
+  var matches = document.getElementById(name + '_matches');
+  var request = null;
+  matches.style.display = 'none';
+
+  function words() {
+    return field.value.split(/\s+/);
+  }
+
+  function choose(match) {
+    if (multiple) {
+      var parts = words();
+      parts[parts.length - 1] = match;
+      field.value = parts.join(' ') + ' ';
+    } else {
+      field.value = match;
+    }
+    matches.style.display = 'none';
+    field.focus();
+  }
+
+  function show(names) {
+    matches.innerHTML = '';
+    for (var i = 0; i < names.length; i++) {
+      var item = document.createElement('div');
+      item.appendChild(document.createTextNode(names[i]));
+      item.onclick = (function(match) {
+        return function() { choose(match); };
+      })(names[i]);
+      matches.appendChild(item);
+    }
+    matches.style.display = names.length ? 'block' : 'none';
+  }
+
+  field.onkeyup = function() {
+    var parts = words();
+    var prefix = parts[parts.length - 1];
+    if (request) request.abort();
+    if (!prefix) {
+      show([]);
+      return;
+    }
+    var current = new XMLHttpRequest();
+    current.open('GET', url + '?prefix=' + encodeURIComponent(prefix), true);
+    current.onreadystatechange = function() {
+      if (current.readyState !== 4 || current.status !== 200) return;
+      show(JSON.parse(current.responseText));
+    };
+    current.send(null);
+    request = current;
+  };
+}
@@ -0,0 +1,69 @@
+""" slog: Simple sample tracker system.
+
+Streaming of response bodies. A dispatcher may set a generator of body
+chunks in the WSGI environ instead of appending the whole body to the
+response. The middleware wrapping the application then yields those
+chunks after the headers have been sent, so that the first bytes go
+out before the last part of the body has been produced.
+
+Per Kraulis
+2011-04-12
+"""
+
+import logging
+
+
+STREAM_KEY = 'slog.stream'
+
+
+def set_stream(environ, chunks):
+    "Set the iterable of body chunks to stream for the request."
+    environ[STREAM_KEY] = chunks
+
+
+class StreamedBody(object):
+    """WSGI iterable yielding the body produced by the application,
+    followed by the streamed chunks."""
+
+    def __init__(self, result, chunks):
+        self.result = result
+        self.chunks = chunks
+
+    def __iter__(self):
+        for chunk in self.result:
+            yield chunk
+        try:
+            for chunk in self.chunks:
+                yield chunk
+        except Exception:
+            # Headers have been sent; all that can be done is to log it
+            logging.exception('error while streaming response')
+            raise
+
+    def close(self):
+        if hasattr(self.result, 'close'):
+            self.result.close()
+        if hasattr(self.chunks, 'close'):
+            self.chunks.close()
+
+
+class StreamingMiddleware(object):
+    "Wrap the WSGI application to stream the body chunks, if any."
+
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        def start(status, headers, exc_info=None):
+            if STREAM_KEY in environ:   # Length unknown until done
+                headers = [(k, v) for k, v in headers
+                           if k.lower() != 'content-length']
+            if exc_info is None:
+                return start_response(status, headers)
+            else:
+                return start_response(status, headers, exc_info)
+        result = self.application(environ, start)
+        chunks = environ.pop(STREAM_KEY, None)
+        if chunks is None:
+            return result
+        return StreamedBody(result, chunks)
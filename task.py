@@ -119,12 +119,19 @@ class Tasks(Dispatcher):
         page.append(P(self.get_operator_select_form('tasks',operator)))
 
         if operator:
-            view = self.db.view('task/operator', include_docs=True)
-            result = view[operator]
+            results, navigation = self.get_page(request,
+                                                'task/operator_name',
+                                                'tasks',
+                                                startkey=[operator],
+                                                endkey=[operator, {}],
+                                                fields=dict(operator=operator))
+            names = [r.key[1] for r in results]
         else:
-            result = self.db.view('task/name', include_docs=True)
-        tasks = [r.doc for r in result]
-        tasks.sort(lambda i, j: cmp(i['name'], i['name']))
+            results, navigation = self.get_page(request,
+                                                'task/list',
+                                                'tasks',
+                                                fields=dict(operator='all'))
+            names = [r.key for r in results]
 
         rows = [TR(TH('Task'),
                    TH('Runname'),
@@ -132,25 +139,29 @@ class Tasks(Dispatcher):
                    TH('Instrument'),
                    TH('Operator'),
                    TH('Timestamp'))]
-        for row in result:
-            doc = row.doc
-            task = A(doc['name'], href=configuration.get_entity_url(doc))
-            url = configuration.get_url('protocol', doc['protocol'])
-            protocol = A(doc['protocol'], href=url)
-            instrument = doc.get('instrument') or ''
+        for name, result in zip(names, results):
+            summary = result.value
+            task = A(name, href=configuration.get_url('task', name))
+            protocol = summary['protocol'] or ''
+            if protocol:
+                url = configuration.get_url('protocol', protocol)
+                protocol = A(protocol, href=url)
+            instrument = summary['instrument'] or ''
             if instrument:
                 url = configuration.get_url('instrument', instrument)
                 instrument = A(instrument, href=url)
-            operator = doc.get('operator') or ''
+            operator = summary['operator'] or ''
             if operator:
                 url = configuration.get_url('account', operator)
                 operator = A(operator, href=url)
             rows.append(TR(TD(task),
-                           TD(doc.get('runname') or ''),
+                           TD(summary['runname'] or ''),
                            TD(protocol),
                            TD(instrument),
                            TD(operator),
-                           TD(doc['timestamp'])))
+                           TD(summary['timestamp'] or '')))
         page.append(TABLE(border=1, *rows))
+        if navigation:
+            page.append(navigation)
 
         page.write(response)
@@ -8,6 +8,13 @@ Per Kraulis
 
 import utils
 from .dispatcher import *
+from .cache import Cache
+
+
+# Memoized results of 'BaseTool.is_enabled', keyed by the tool and the
+# ids and revisions of the documents that the result depends on.
+ENABLED_CACHE = Cache(size=getattr(configuration.site,
+                                   'TOOL_ENABLED_CACHE_SIZE', 1000))
 
 
 class ToolDispatcher(Dispatcher):
@@ -30,7 +37,7 @@ class ToolDispatcher(Dispatcher):
         except (KeyError, ValueError):
             raise HTTP_BAD_REQUEST('Invalid entity specified.')
         self.tool = tool_class(self)
-        if not self.tool.is_enabled(self.doc):
+        if not self.tool.check_enabled(self.doc):
             raise HTTP_BAD_REQUEST("Tool '%s' is not enabled for entity '%s'."
                                    % (self.tool, self.doc['name']))
 
@@ -80,9 +87,37 @@ class BaseTool(object):
         return configuration.get_url('tool', self.modulename)
 
     def is_enabled(self, doc):
-        "Can the tool be used with the entity described by the given document?"
+        """Can the tool be used with the entity described by the given document?
+        This should be decided from the documents given by 'get_dependencies'
+        and their attachment stubs only; full data is loaded when run."""
         raise NotImplementedError
 
+    def get_dependencies(self, doc):
+        """Return the list of documents that 'is_enabled' depends on.
+        A referenced document which does not exist must be given as a
+        placeholder dictionary containing only its 'entity' and 'name'."""
+        return [doc]
+
+    def check_enabled(self, doc):
+        """Memoized 'is_enabled', keyed by the revisions of the documents
+        that the result depends on. A placeholder for a missing document
+        is keyed by its entity and name, so that the result is recomputed
+        when the document is created."""
+        key = [self.modulename]
+        for dependency in self.get_dependencies(doc):
+            if '_id' in dependency:
+                key.append((dependency['_id'], dependency.get('_rev')))
+            else:
+                key.append((dependency.get('entity'),
+                            dependency.get('name'),
+                            None))
+        key = tuple(key)
+        result = ENABLED_CACHE.get(key)
+        if result is None:
+            result = bool(self.is_enabled(doc))
+            ENABLED_CACHE.set(key, result)
+        return result
+
     def get_view(self, dispatcher):
         "Produce the HTML containing all input elements for the operation."
         raise NotImplementedError
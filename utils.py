@@ -6,19 +6,28 @@ Per Kraulis
 2011-02-04
 """
 
-import time, datetime, uuid, hashlib, sys
+import time, datetime, uuid, hashlib, sys, threading
 
 # Import couchdb here to silence a strange warning message
 # involving docutils and Python path change...
 import couchdb
 import docutils.core
 
+from . import configuration
+from .cache import Cache
+
 
 DATE_ISO_FORMAT = "%Y-%m-%d"
 TIME_ISO_FORMAT = "%H:%M:%S"
 
 DATETIME_ISO_FORMAT = "%sT%sZ" % (DATE_ISO_FORMAT, TIME_ISO_FORMAT)
 
+# Rendered reStructuredText, keyed by digest of source and settings.
+# Value: tuple (html, seconds taken to render).
+RST_CACHE = Cache(size=getattr(configuration.site, 'RST_CACHE_SIZE', 1000))
+RST_TIME_SAVED = dict(seconds=0.0)
+RST_LOCK = threading.Lock()
+
 
 def url_id(id):
     "Return the absolute URL for the given entity id."
@@ -47,15 +56,43 @@ def get_login_account(dispatcher):
     return dispatcher.user['name']
 
 def rst_to_html(text, initial_header_level=2):
-    "Convert reStructuredText to HTML."
+    """Convert reStructuredText to HTML. The result is cached, keyed by
+    the digest of the text and the settings."""
+    text = text or ''
+    if isinstance(text, unicode):
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    else:
+        digest = hashlib.sha1(text).hexdigest()
+    key = (digest, initial_header_level)
+    cached = RST_CACHE.get(key)
+    if cached is not None:
+        html, seconds = cached
+        with RST_LOCK:
+            RST_TIME_SAVED['seconds'] += seconds
+        return html
+    started = time.time()
     encoding = sys.getdefaultencoding()
     overrides = dict(input_encoding=encoding,
                      output_encoding=encoding,
                      initial_header_level=initial_header_level)
-    result = docutils.core.publish_parts(source=text or '',
+    result = docutils.core.publish_parts(source=text,
                                          writer_name='html',
                                          settings_overrides=overrides)
-    return result['html_body']
+    html = result['html_body']
+    RST_CACHE.set(key, (html, time.time() - started))
+    return html
+
+def prerender_rst(texts):
+    "Render the static texts into the cache, e.g. docstrings at import."
+    for text in texts:
+        rst_to_html(text)
+
+def get_rst_stats():
+    "Return a dictionary of the reStructuredText cache counters."
+    result = RST_CACHE.get_stats()
+    with RST_LOCK:
+        result['saved'] = RST_TIME_SAVED['seconds']
+    return result
 
 def grid_coordinate(row=None, column=None, multiplex=None):
     """Return the string grid coordinate for the row/column/multiplex
@@ -71,6 +108,26 @@ def grid_coordinate(row=None, column=None, multiplex=None):
         parts.append(".%i" % (multiplex+1))
     return ''.join(parts)
 
+def collation_key(value):
+    "Return a sort key approximating the CouchDB collation of JSON values."
+    if value is None:
+        return (0,)
+    elif value is False:
+        return (1,)
+    elif value is True:
+        return (2,)
+    elif isinstance(value, (int, long, float)):
+        return (3, value)
+    elif isinstance(value, basestring):
+        return (4, value.lower(), value.swapcase())
+    elif isinstance(value, (list, tuple)):
+        return (5, tuple([collation_key(v) for v in value]))
+    elif isinstance(value, dict):
+        return (6, tuple([(collation_key(k), collation_key(v))
+                          for k, v in sorted(value.items())]))
+    else:
+        raise TypeError("cannot collate value '%s'" % value)
+
 def flatten(array):
     "Return the items in the hierarchical list of lists as a single list."
     result = []
@@ -0,0 +1,209 @@
+""" slog: Simple sample tracker system.
+
+Python ports of the CouchDB views under 'designs/', for use with
+the in-memory database in 'memdb'. Each map function is a generator
+of (key, value) tuples for a document. NOTE: a change in a JavaScript
+view must be made in its port here too; 'misc/check_views.py' compares
+the two on a fixture set.
+
+Per Kraulis
+2011-04-06
+"""
+
+
+VIEWS = dict()      # Key: 'design/view', value: (map function, reduce)
+
+
+def view(name, reduce=None):
+    "Decorator to register the map function of the named view."
+    def register(function):
+        VIEWS[name] = (function, reduce)
+        return function
+    return register
+
+def name_view(entity, value=lambda doc: None):
+    "Register a view indexing the documents of the entity by name."
+    @view("%s/name" % entity)
+    def map(doc):
+        if doc.get('entity') != entity: return
+        yield doc.get('name'), value(doc)
+    return map
+
+def reference_view(entity, field):
+    """Register a view indexing the documents of the entity by the
+    value of the given field. Value: name."""
+    @view("%s/%s" % (entity, field))
+    def map(doc):
+        if doc.get('entity') != entity: return
+        if not doc.get(field): return
+        yield doc[field], doc.get('name')
+    return map
+
+def sorted_reference_view(entity, field, value=lambda doc: None):
+    """Register a view indexing the documents of the entity by the
+    value of the given field and the name, for lists sorted by name."""
+    @view("%s/%s_name" % (entity, field))
+    def map(doc):
+        if doc.get('entity') != entity: return
+        yield [doc.get(field), doc.get('name')], value(doc)
+    return map
+
+def count_view(entity, field):
+    """Register a view counting the documents of the entity per value
+    of the given field."""
+    @view("%s/%s_count" % (entity, field), reduce='_count')
+    def map(doc):
+        if doc.get('entity') != entity: return
+        if not doc.get(field): return
+        yield doc[field], 1
+    return map
+
+def list_view(entity, key, value):
+    """Register the view for the list page of the entity: the documents
+    in list order, with the columns shown in the list as value."""
+    @view("%s/list" % entity)
+    def map(doc):
+        if doc.get('entity') != entity: return
+        yield key(doc), value(doc)
+    return map
+
+
+# Summaries of documents for the list pages.
+
+def account_summary(doc):
+    return dict(fullname=doc.get('fullname') or None,
+                role=doc.get('role') or None,
+                initials=doc.get('initials') or None)
+
+def instrument_summary(doc):
+    return dict(label=doc.get('label') or None,
+                type=doc.get('type') or None,
+                timestamp=doc.get('timestamp') or None)
+
+def project_summary(doc):
+    return dict(name=doc.get('name'),
+                label=doc.get('label') or None,
+                customer=doc.get('customer') or None,
+                timestamp=doc.get('timestamp') or None)
+
+def protocol_summary(doc):
+    return dict(timestamp=doc.get('timestamp') or None)
+
+def task_summary(doc):
+    return dict(runname=doc.get('runname') or None,
+                protocol=doc.get('protocol') or None,
+                instrument=doc.get('instrument') or None,
+                operator=doc.get('operator') or None,
+                timestamp=doc.get('timestamp') or None)
+
+def workset_summary(doc):
+    return dict(operator=doc.get('operator') or None,
+                count=len(doc.get('samples') or []),
+                timestamp=doc.get('timestamp') or None)
+
+
+name_view('account', value=lambda doc: doc.get('fullname') or None)
+name_view('instrument', value=lambda doc: doc.get('label') or None)
+name_view('project', value=lambda doc: doc.get('label') or None)
+name_view('protocol')
+name_view('sample', value=lambda doc: doc.get('project'))
+name_view('task')
+name_view('workset')
+
+reference_view('sample', 'project')
+
+sorted_reference_view('project', 'customer', value=project_summary)
+sorted_reference_view('task', 'operator', value=task_summary)
+sorted_reference_view('workset', 'operator', value=workset_summary)
+
+count_view('project', 'customer')
+count_view('task', 'operator')
+count_view('workset', 'operator')
+
+by_name = lambda doc: doc.get('name')
+list_view('account', by_name, account_summary)
+list_view('instrument', by_name, instrument_summary)
+list_view('project', lambda doc: doc.get('timestamp'), project_summary)
+list_view('protocol', by_name, protocol_summary)
+list_view('task', by_name, task_summary)
+list_view('workset', by_name, workset_summary)
+
+
+@view('all/timestamp')
+def all_timestamp(doc):
+    if not doc.get('timestamp'): return
+    if not doc.get('entity'): return
+    yield doc['timestamp'], [doc['entity'], doc.get('name')]
+
+@view('all/search')
+def all_search(doc):
+    if doc.get('entity') not in ('account', 'project', 'sample', 'workset',
+                                 'protocol', 'task', 'instrument'): return
+    if not doc.get('name'): return
+    values = [(doc.get(a), a)
+              for a in ('name', 'operator', 'customername', 'runname')]
+    values.extend([(t, 'tag') for t in doc.get('tags') or []])
+    for value, attribute in values:
+        if not isinstance(value, basestring) or not value: continue
+        yield value.lower(), [doc['entity'], doc['name'], attribute]
+
+@view('log/docid_timestamp')
+def log_docid_timestamp(doc):
+    if doc.get('entity') != 'log': return
+    if not doc.get('docid'): return
+    if not doc.get('timestamp'): return
+    yield [doc['docid'], doc['timestamp']], \
+          dict(action=doc.get('action'),
+               account=doc.get('account') or None,
+               comment=doc.get('comment') or None,
+               sequence=doc.get('sequence') or None,
+               checkpoint=bool(doc.get('checkpoint')),
+               rev=doc.get('rev') or None)
+
+@view('log/docid_sequence')
+def log_docid_sequence(doc):
+    if doc.get('entity') != 'log': return
+    if not doc.get('docid'): return
+    if not doc.get('sequence'): return
+    yield [doc['docid'], doc['sequence']], \
+          dict(checkpoint=bool(doc.get('checkpoint')),
+               rev=doc.get('rev') or None)
+
+@view('project/customer')
+def project_customer(doc):
+    if doc.get('entity') != 'project': return
+    yield doc.get('customer'), doc.get('name')
+
+@view('protocol/instrument')
+def protocol_instrument(doc):
+    if doc.get('entity') != 'protocol': return
+    for instrument in doc.get('instruments') or []:
+        yield instrument, doc.get('name')
+
+@view('sample/project_list')
+def sample_project_list(doc):
+    if doc.get('entity') != 'sample': return
+    if not doc.get('project'): return
+    yield doc['project'], [doc.get('name'), doc.get('customername') or None]
+
+@view('sample/project_count', reduce='_count')
+def sample_project_count(doc):
+    if doc.get('entity') != 'sample': return
+    yield doc.get('project'), 1
+
+@view('task/protocol')
+def task_protocol(doc):
+    if doc.get('entity') != 'task': return
+    yield doc.get('protocol'), None
+
+@view('task/workset')
+def task_workset(doc):
+    if doc.get('entity') != 'task': return
+    if not doc.get('workset'): return
+    yield doc['workset'], None
+
+@view('workset/sample')
+def workset_sample(doc):
+    if doc.get('entity') != 'workset': return
+    for sample in doc.get('samples') or []:
+        yield sample, None
@@ -180,34 +180,43 @@ class Worksets(Dispatcher):
         page.append(P(self.get_operator_select_form('worksets', operator)))
 
         if operator:
-            view = self.db.view('workset/operator', include_docs=True)[operator]
+            results, navigation = self.get_page(request,
+                                                'workset/operator_name',
+                                                'worksets',
+                                                startkey=[operator],
+                                                endkey=[operator, {}],
+                                                fields=dict(operator=operator))
+            names = [r.key[1] for r in results]
         else:
-            view = self.db.view('workset/name', include_docs=True)
-        worksets = [r.doc for r in view]
-        worksets.sort(lambda i, j: cmp(i['name'], i['name']))
+            results, navigation = self.get_page(request,
+                                                'workset/list',
+                                                'worksets',
+                                                fields=dict(operator='all'))
+            names = [r.key for r in results]
+
+        page.append(StreamedTable(TR(TH('Workset'),
+                                     TH('Operator'),
+                                     TH('# samples'),
+                                     TH('Timestamp')),
+                                  self.get_rows(names, results),
+                                  border=1))
+        if navigation:
+            page.append(navigation)
 
-        rows = [TR(TH('Workset'),
-                   TH('Operator'),
-                   TH('Samples'),
-                   TH('Timestamp'))]
-        for workset in worksets:
-            operator = workset.get('operator')
+        page.write(response)
+
+    def get_rows(self, names, results):
+        "Generate the table rows for the worksets from the view summaries."
+        for name, result in zip(names, results):
+            summary = result.value
+            operator = summary['operator']
             if operator:
                 url = configuration.get_url('account', operator)
                 operator = A(operator, href=url)
             else:
                 operator = ''
-            samples = workset.get('samples', [])
-            for i, sample in enumerate(samples):
-                url = configuration.get_url('sample', sample)
-                samples[i] = str(A(sample, href=url))
-            samples = ', '.join(samples)
-
-            url = configuration.get_url('workset', workset['name'])
-            rows.append(TR(TD(A(workset['name'], href=url)),
-                           TD(operator),
-                           TD(samples),
-                           TD(workset['timestamp'])))
-        page.append(TABLE(border=1, *rows))
-
-        page.write(response)
+            url = configuration.get_url('workset', name)
+            yield TR(TD(A(name, href=url)),
+                     TD(operator),
+                     TD(str(summary['count'])),
+                     TD(summary['timestamp'] or ''))
@@ -20,11 +20,20 @@ from slog.workset import Workset, WorksetCreate, Worksets
 from slog.instrument import Instrument, InstrumentCreate, Instruments
 from slog.task import Task, TaskCreate, Tasks
 from slog.tool import ToolDispatcher
-from slog.dispatcher import Id, Doc, Static, Attachment
+from slog.dispatcher import Id, Doc, Static, Attachment, Names
+from slog import utils
+from slog.streaming import StreamingMiddleware
 
 
 logging.basicConfig(level=logging.INFO)
 
+# Pre-render the static docstrings and field descriptions.
+for klass in [Account, Protocol, Project, Sample,
+              Workset, Instrument, Task]:
+    utils.prerender_rst([klass.__doc__] +
+                        [f.description for f in klass.fields] +
+                        [t.__doc__ for t in klass.tool_classes])
+
 
 application = WsgiApplication(human_debug_output=True)
 
@@ -55,5 +64,9 @@ application.add_class(r'^/tasks$', Tasks)
 application.add_class(r'^/task/(?P<name>[^/]+)$', Task)
 application.add_class(r'^/task/?$', TaskCreate)
 application.add_class(r'^/tool/(?P<name>[^/]+)$', ToolDispatcher)
+application.add_class(r'^/names/(?P<entity>[a-z]+)$', Names)
 application.add_class(r'^/id/(?P<id>[a-f0-9]{32,32})$', Id)
 application.add_class(r'^/doc/(?P<id>[a-f0-9]{32,32})$', Doc)
+
+# Stream the body chunks of pages that produce their rows incrementally.
+application = StreamingMiddleware(application)